@@ -0,0 +1,44 @@
+'''
+Runtime of the adaptive binnings `bayesian_blocks_binning` and
+`significance_binning` on a simulated light curve with flares.
+'''
+import time
+
+import click
+import numpy as np
+import pandas as pd
+
+from fact.analysis.binning import bayesian_blocks_binning, significance_binning
+
+
+def simulate_runs(n_runs, n_states):
+    ontime = np.random.uniform(250, 290, n_runs)
+    n_off = np.random.poisson(50, n_runs)
+
+    # piecewise constant excess rate, changing at random runs
+    states = np.sort(np.random.randint(0, n_runs, n_states - 1))
+    rates = np.random.exponential(10, n_states)
+    rate = rates[np.searchsorted(states, np.arange(n_runs), side='right')]
+
+    n_on = np.random.poisson(0.2 * n_off + rate * ontime / 300)
+    return pd.DataFrame({'ontime': ontime, 'n_on': n_on, 'n_off': n_off})
+
+
+@click.command()
+@click.option('-n', '--n-runs', default=100000, help='Number of runs')
+@click.option('-s', '--n-states', default=1000, help='Number of different flux states')
+def main(n_runs, n_states):
+    runs = simulate_runs(n_runs, n_states)
+    print('{} runs with {} flux states'.format(n_runs, n_states))
+
+    for name, binning in [
+            ('bayesian_blocks_binning', bayesian_blocks_binning),
+            ('significance_binning', significance_binning)]:
+        t0 = time.perf_counter()
+        bins = binning(runs)
+        t = time.perf_counter() - t0
+        print('{:>23}: {:6.2f} s, {} bins'.format(name, t, bins.iloc[-1] + 1))
+
+
+if __name__ == '__main__':
+    main()
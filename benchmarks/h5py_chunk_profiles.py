@@ -0,0 +1,62 @@
+'''
+Compare write and read throughput and file size of h5py files
+written with the different chunk / compression profiles of `fact.io`
+and with h5py's automatic chunking on a synthetic events table.
+'''
+import os
+import tempfile
+import time
+
+import click
+import numpy as np
+import pandas as pd
+
+from fact.io import to_h5py, read_h5py, H5PY_PROFILES, get_default_compression
+
+
+def synthetic_events(n_events, n_columns):
+    rng = np.random.RandomState(0)
+    data = {
+        'run_id': np.repeat(np.arange(n_events // 1000 + 1), 1000)[:n_events],
+        'event_num': np.arange(n_events),
+        'gamma_prediction': rng.uniform(0, 1, n_events).astype('float32'),
+    }
+    for i in range(n_columns - len(data)):
+        # rounded values to get realistic, compressible data
+        data['feature_{}'.format(i)] = np.round(rng.normal(0, 1, n_events), 3)
+
+    return pd.DataFrame(data)
+
+
+@click.command()
+@click.option('-n', '--n-events', default=1000000, help='Number of events')
+@click.option('-c', '--n-columns', default=20, help='Number of columns')
+def main(n_events, n_columns):
+    df = synthetic_events(n_events, n_columns)
+    size = df.memory_usage().sum() / 1e6
+    print('Events table: {} rows, {} columns, {:.1f} MB'.format(n_events, n_columns, size))
+
+    setups = {'h5py auto': dict(chunks=True, **get_default_compression())}
+    setups.update({p: dict(profile=p) for p in H5PY_PROFILES})
+
+    for name, kwargs in setups.items():
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'events.hdf5')
+
+            t0 = time.perf_counter()
+            to_h5py(df, path, key='events', mode='w', index=False, **kwargs)
+            t_write = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            read_h5py(path, key='events')
+            t_read = time.perf_counter() - t0
+
+            file_size = os.path.getsize(path) / 1e6
+
+        print('{:>12}: write {:7.1f} MB/s, read {:7.1f} MB/s, file size {:7.1f} MB'.format(
+            name, size / t_write, size / t_read, file_size,
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+'''
+Compare reading datetime columns stored as ISO strings
+with datetimes stored as int64 nanoseconds since the unix epoch.
+'''
+import os
+import tempfile
+import time
+
+import click
+import pandas as pd
+
+from fact.io import to_h5py, read_h5py
+
+
+@click.command()
+@click.option('-n', '--n-timestamps', default=10000000, help='Number of timestamps')
+def main(n_timestamps):
+    df = pd.DataFrame({
+        'timestamp': pd.date_range('2017-01-01', freq='37ms', periods=n_timestamps),
+    })
+    print('{} timestamps'.format(n_timestamps))
+
+    for timeformat in ('iso', 'unix'):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'events.hdf5')
+
+            t0 = time.perf_counter()
+            to_h5py(df, path, key='events', index=False, timeformat=timeformat)
+            t_write = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            df_read = read_h5py(path, key='events')
+            t_read = time.perf_counter() - t0
+
+            assert df_read['timestamp'].equals(df['timestamp'])
+            file_size = os.path.getsize(path) / 1e6
+
+        print('{:>5}: write {:6.2f} s, read {:6.2f} s, file size {:7.1f} MB'.format(
+            timeformat, t_write, t_read, file_size,
+        ))
+
+
+if __name__ == '__main__':
+    main()
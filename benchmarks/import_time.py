@@ -0,0 +1,55 @@
+'''
+Measure the time it takes to import `fact.io` in a fresh interpreter
+and the time of the first call to `get_default_compression`,
+which checks for blosc support on first use.
+'''
+import subprocess
+import sys
+
+import click
+import numpy as np
+
+
+def run(code):
+    out = subprocess.check_output([sys.executable, '-c', code], stderr=subprocess.DEVNULL)
+    return float(out)
+
+
+IMPORT = '''
+import time
+t0 = time.perf_counter()
+import fact.io
+print(time.perf_counter() - t0)
+'''
+
+IMPORT_DEPS = '''
+import time
+t0 = time.perf_counter()
+import numpy, pandas, h5py, tables, astropy.units
+print(time.perf_counter() - t0)
+'''
+
+FIRST_WRITE = '''
+import time
+import fact.io
+t0 = time.perf_counter()
+fact.io.get_default_compression()
+print(time.perf_counter() - t0)
+'''
+
+
+@click.command()
+@click.option('-n', '--n-runs', default=10, help='Number of repetitions')
+def main(n_runs):
+    for name, code in (
+            ('dependencies', IMPORT_DEPS),
+            ('import fact.io', IMPORT),
+            ('compression check', FIRST_WRITE)):
+        times = np.array([run(code) for _ in range(n_runs)]) * 1000
+        print('{:>18}: median {:7.1f} ms, min {:7.1f} ms'.format(
+            name, np.median(times), times.min()
+        ))
+
+
+if __name__ == '__main__':
+    main()
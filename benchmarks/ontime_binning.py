@@ -0,0 +1,93 @@
+'''
+Compare the list based `ontime_binning` and `qla_binning`
+with the previous implementations iterating over `DataFrame.iterrows`.
+'''
+import datetime
+import time
+
+import click
+import numpy as np
+import pandas as pd
+
+from fact.analysis.binning import ontime_binning, qla_binning
+
+
+def ontime_binning_iterrows(runs, bin_width_minutes=20):
+    bin_width_sec = bin_width_minutes * 60
+    bin_number = 0
+    ontime_sum = 0
+
+    bins = []
+    last_stop = runs['run_start'].iloc[0]
+    delta_t_max = datetime.timedelta(seconds=bin_width_sec)
+
+    for key, row in runs.iterrows():
+        delta_t = row.run_start - last_stop
+        last_stop = row.run_stop
+
+        if ontime_sum + row.ontime > bin_width_sec or delta_t > delta_t_max:
+            bin_number += 1
+            ontime_sum = 0
+
+        bins.append(bin_number)
+        ontime_sum += row.ontime
+
+    return pd.Series(bins, index=runs.index)
+
+
+def qla_binning_iterrows(data, bin_width_minutes=20):
+    bin_number = 0
+    ontime_sum = 0
+    bins = []
+
+    for key, row in data.iterrows():
+        if ontime_sum + row.fOnTimeAfterCuts > bin_width_minutes * 60:
+            bin_number += 1
+            ontime_sum = 0
+
+        bins.append(bin_number)
+        ontime_sum += row['ontime']
+
+    return pd.Series(bins, index=data.index)
+
+
+def simulate_runs(n_runs):
+    duration = np.random.uniform(250, 300, n_runs)
+    gap = np.where(np.random.uniform(size=n_runs) < 0.05, 3600 * 12, 30)
+    start = np.cumsum(duration + gap)
+
+    runs = pd.DataFrame({
+        'run_start': pd.Timestamp('2013-01-01') + pd.to_timedelta(start, unit='s'),
+        'ontime': duration * np.random.uniform(0.9, 0.99, n_runs),
+    })
+    runs['run_stop'] = runs['run_start'] + pd.to_timedelta(duration, unit='s')
+    runs['fOnTimeAfterCuts'] = runs['ontime'] * 0.98
+    return runs
+
+
+@click.command()
+@click.option('-n', '--n-runs', default=100000, help='Number of runs')
+def main(n_runs):
+    runs = simulate_runs(n_runs)
+    print('{} runs'.format(n_runs))
+
+    for name, old, new in [
+            ('ontime_binning', ontime_binning_iterrows, ontime_binning),
+            ('qla_binning', qla_binning_iterrows, qla_binning)]:
+
+        t0 = time.perf_counter()
+        bins_old = old(runs)
+        t_old = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        bins_new = new(runs)
+        t_new = time.perf_counter() - t0
+
+        assert bins_new.equals(bins_old)
+        print('{:>14}: iterrows {:6.3f} s, lists {:6.3f} s, {} bins'.format(
+            name, t_old, t_new, bins_new.iloc[-1] + 1
+        ))
+
+
+if __name__ == '__main__':
+    main()
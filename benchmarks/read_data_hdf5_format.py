@@ -0,0 +1,71 @@
+'''
+Compare reading many small h5py style per-run files with `read_data`
+by trying `pd.read_hdf` first and falling back to `read_h5py`,
+with sending each file directly to the right reader after
+sniffing the format.
+'''
+import os
+import tempfile
+import time
+
+import click
+import numpy as np
+import pandas as pd
+
+from fact.io import to_h5py, read_h5py, read_data, sniff_hdf5_format
+
+
+def read_data_fallback(file_path, key):
+    try:
+        return pd.read_hdf(file_path, key=key)
+    except (TypeError, ValueError):
+        return read_h5py(file_path, key=key)
+
+
+@click.command()
+@click.option('-n', '--n-files', default=2000, help='Number of per-run files')
+@click.option('-r', '--n-rows', default=100, help='Number of rows per file')
+def main(n_files, n_rows):
+    df = pd.DataFrame({
+        'night': np.full(n_rows, 20170101),
+        'run_id': np.arange(n_rows),
+        'gamma_prediction': np.random.uniform(0, 1, n_rows),
+        'theta_deg': np.random.uniform(0, 1, n_rows),
+    })
+
+    with tempfile.TemporaryDirectory() as d:
+        paths = [os.path.join(d, 'run_{}.hdf5'.format(i)) for i in range(n_files)]
+        for p in paths:
+            to_h5py(df, p, key='events')
+
+        t0 = time.perf_counter()
+        for p in paths:
+            read_data_fallback(p, key='events')
+        t_fallback = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for p in paths:
+            read_data(p, key='events')
+        t_sniff = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for p in paths:
+            read_data(p, key='events')
+        t_cached = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for p in paths:
+            sniff_hdf5_format(p)
+        t_lookup = time.perf_counter() - t0
+
+    print('{} files with {} rows'.format(n_files, n_rows))
+    for name, t in [
+            ('read_hdf fallback', t_fallback),
+            ('sniffing', t_sniff),
+            ('sniffing, cached', t_cached),
+            ('cache lookup only', t_lookup)]:
+        print('{:>18}: {:6.2f} s, {:6.2f} ms per file'.format(name, t, 1e3 * t / n_files))
+
+
+if __name__ == '__main__':
+    main()
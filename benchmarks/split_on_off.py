@@ -0,0 +1,77 @@
+'''
+Compare the vectorized `split_on_off_source_independent` with the
+previous implementation, that selected and copied the events
+once per off region and dropped the off columns one by one.
+'''
+import time
+
+import click
+import numpy as np
+import pandas as pd
+
+from fact.analysis.core import split_on_off_source_independent, off_key_re
+
+
+def drop_off_columns_loop(df, off_region):
+    for col in df.columns:
+        m = off_key_re.match(col)
+        if m:
+            on_key, key_region = m.groups()
+            if int(key_region) == off_region:
+                df.drop(on_key, axis=1, inplace=True)
+                df[on_key] = df[col]
+
+            df.drop(col, axis=1, inplace=True)
+
+
+def split_on_off_loop(events, theta2_cut, theta_key, theta_off_keys):
+    theta_cut = np.sqrt(theta2_cut)
+
+    on_data = events.query('{} <= {}'.format(theta_key, theta_cut))
+
+    off_dfs = []
+    for region, theta_off_key in enumerate(theta_off_keys, start=1):
+        off_df = events.query('{} <= {}'.format(theta_off_key, theta_cut)).copy()
+        off_df['off_region'] = region
+        drop_off_columns_loop(off_df, region)
+        off_dfs.append(off_df)
+
+    return on_data, pd.concat(off_dfs)
+
+
+@click.command()
+@click.option('-n', '--n-events', default=10000000, help='Number of events')
+@click.option('-c', '--n-columns', default=100, help='Total number of columns')
+@click.option('--theta2-cut', default=0.025, help='theta^2 cut in deg^2')
+def main(n_events, n_columns, theta2_cut):
+    theta_off_keys = ['theta_deg_off_{}'.format(i) for i in range(1, 6)]
+
+    events = pd.DataFrame({'theta_deg': np.random.uniform(0, 1, n_events)})
+    for key in theta_off_keys:
+        events[key] = np.random.uniform(0, 1, n_events)
+    for i in range(n_columns - len(events.columns)):
+        events['feature_{}'.format(i)] = np.random.normal(size=n_events)
+
+    print('{} events, {} columns'.format(n_events, len(events.columns)))
+
+    t0 = time.perf_counter()
+    on_loop, off_loop = split_on_off_loop(events, theta2_cut, 'theta_deg', theta_off_keys)
+    t_loop = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    on_data, off_data = split_on_off_source_independent(
+        events, theta2_cut, 'theta_deg', theta_off_keys
+    )
+    t_vectorized = time.perf_counter() - t0
+
+    assert on_data.equals(on_loop)
+    assert off_data.equals(off_loop)
+    assert list(off_data.columns) == list(off_loop.columns)
+
+    print('{} on events, {} off events'.format(len(on_data), len(off_data)))
+    print('      loop: {:6.2f} s'.format(t_loop))
+    print('vectorized: {:6.2f} s'.format(t_vectorized))
+
+
+if __name__ == '__main__':
+    main()
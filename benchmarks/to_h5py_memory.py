@@ -0,0 +1,63 @@
+'''
+Compare peak memory and runtime of the column-wise `to_h5py`
+with the previous path, which built a record array using
+`df.to_records` and `change_recarray_dtype` before writing.
+'''
+import tempfile
+import time
+import tracemalloc
+
+import click
+import h5py
+import numpy as np
+import pandas as pd
+
+from fact.io import to_h5py, change_recarray_dtype, initialize_h5py, append_to_h5py
+
+
+def to_h5py_records(df, filename, key='data', dtypes=None, index=True):
+    array = df.to_records(index=index)
+
+    if dtypes is not None:
+        array = change_recarray_dtype(array, dtypes)
+
+    with h5py.File(filename, mode='w') as f:
+        initialize_h5py(f, array, key=key)
+        append_to_h5py(f, array, key=key)
+
+
+def to_h5py_columns(df, filename, key='data', dtypes=None, index=True):
+    to_h5py(df, filename, key=key, mode='w', dtypes=dtypes, index=index)
+
+
+def measure(function, *args, **kwargs):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    function(*args, **kwargs)
+    duration = time.perf_counter() - t0
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return duration, peak
+
+
+@click.command()
+@click.option('-n', '--n-rows', default=100000, help='Number of rows')
+@click.option('-c', '--n-columns', default=300, help='Number of columns')
+def main(n_rows, n_columns):
+    df = pd.DataFrame(
+        np.random.normal(size=(n_rows, n_columns)),
+        columns=['col_{}'.format(i) for i in range(n_columns)],
+    )
+    dtypes = {col: 'float32' for col in df.columns[::2]}
+    size = df.memory_usage().sum() / 1e6
+
+    print('DataFrame: {} rows, {} columns, {:.1f} MB'.format(n_rows, n_columns, size))
+
+    for name, function in (('to_records', to_h5py_records), ('columns', to_h5py_columns)):
+        with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+            duration, peak = measure(function, df, f.name, dtypes=dtypes)
+        print('{:>10}: {:6.2f} s, peak memory {:8.1f} MB'.format(name, duration, peak / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,18 @@
 from .statistics import li_ma_significance
-from .binning import ontime_binning, qla_binning, groupby_observation_blocks, bin_runs
+from .binning import (
+    ontime_binning,
+    qla_binning,
+    groupby_observation_blocks,
+    bin_runs,
+    OnlineLightCurve,
+)
 
-from .core import calc_run_summary_source_independent, split_on_off_source_independent
+from .core import (
+    calc_run_summary_source_independent,
+    split_on_off_source_independent,
+    split_on_off_source_independent_chunked,
+    CumulativeRunHistogram,
+)
 
 from .source import (
     calc_theta_equatorial,
@@ -16,8 +27,11 @@ __all__ = [
     'qla_binning',
     'groupby_observation_blocks',
     'bin_runs',
+    'OnlineLightCurve',
     'calc_run_summary_source_independent',
     'split_on_off_source_independent',
+    'split_on_off_source_independent_chunked',
+    'CumulativeRunHistogram',
     'calc_theta_equatorial',
     'calc_theta_camera',
     'calc_theta_offs_camera',
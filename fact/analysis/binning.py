@@ -1,10 +1,17 @@
 import pandas as pd
-import datetime
 import numpy as np
+from itertools import repeat
+from inspect import signature
+from scipy.stats import norm
 
 from .statistics import li_ma_significance
 
 
+# a full moon and the mean length of a lunar cycle, used for moon_period_binning
+FULL_MOON_REFERENCE = pd.Timestamp('2000-01-21 04:40')
+SYNODIC_MONTH_DAYS = 29.530588853
+
+
 def ontime_binning(runs, bin_width_minutes=20):
     '''
     Calculate bin numbers for given runs.
@@ -24,44 +31,64 @@ def ontime_binning(runs, bin_width_minutes=20):
         slightly less than `bin_width_minutes`
     '''
     bin_width_sec = bin_width_minutes * 60
-    bin_number = 0
-    ontime_sum = 0
+    delta_t_max = pd.Timedelta(seconds=bin_width_sec).to_timedelta64()
 
-    bins = []
-    last_stop = runs['run_start'].iloc[0]
-    delta_t_max = datetime.timedelta(seconds=bin_width_sec)
+    # a gap larger than the bin width to the previous run starts a new bin,
+    # .values gives datetime64[ns] also for timezone aware columns
+    run_start = runs['run_start'].values
+    run_stop = runs['run_stop'].values
+    new_bin = np.zeros(len(runs), dtype=bool)
+    new_bin[1:] = (run_start[1:] - run_stop[:-1]) > delta_t_max
 
-    for key, row in runs.iterrows():
-        delta_t = row.run_start - last_stop
-        last_stop = row.run_stop
+    bins = greedy_ontime_bins(
+        runs['ontime'].tolist(),
+        runs['ontime'].tolist(),
+        bin_width_sec,
+        new_bin.tolist(),
+    )
 
-        if ontime_sum + row.ontime > bin_width_sec or delta_t > delta_t_max:
-            bin_number += 1
-            ontime_sum = 0
-
-        bins.append(bin_number)
-        ontime_sum += row.ontime
-
-    return pd.Series(bins, index=runs.index)
+    return pd.Series(bins, index=runs.index, dtype='int64')
 
 
 def qla_binning(data, bin_width_minutes=20):
     '''
     The binning algorithm as used by lightcurve.c
     '''
+    bins = greedy_ontime_bins(
+        data['fOnTimeAfterCuts'].tolist(),
+        data['ontime'].tolist(),
+        bin_width_minutes * 60,
+    )
+
+    return pd.Series(bins, index=data.index, dtype='int64')
+
+
+def greedy_ontime_bins(check_ontime, ontime, bin_width_sec, new_bin=None):
+    '''
+    Assign bin numbers to runs, starting a new bin if the ontime
+    of the current bin plus `check_ontime` of the run would exceed `bin_width_sec`
+    or if `new_bin` is True for the run.
+    `ontime` is added to the current bin.
+
+    Operates on plain python lists, iterating over these is much
+    faster than over the rows of a DataFrame.
+    '''
+    if new_bin is None:
+        new_bin = repeat(False)
+
     bin_number = 0
     ontime_sum = 0
     bins = []
 
-    for key, row in data.iterrows():
-        if ontime_sum + row.fOnTimeAfterCuts > bin_width_minutes * 60:
+    for check, t, new in zip(check_ontime, ontime, new_bin):
+        if ontime_sum + check > bin_width_sec or new:
             bin_number += 1
             ontime_sum = 0
 
         bins.append(bin_number)
-        ontime_sum += row['ontime']
+        ontime_sum += t
 
-    return pd.Series(bins, index=data.index)
+    return bins
 
 
 def groupby_observation_blocks(runs):
@@ -72,14 +99,202 @@ def groupby_observation_blocks(runs):
     return runs.groupby(observation_blocks)
 
 
+def factorize_binning(runs, labels):
+    '''
+    Assign one bin per distinct value of `labels`,
+    bins are numbered in order of first appearance.
+    '''
+    bins, _ = pd.factorize(np.asarray(labels))
+    return pd.Series(bins, index=runs.index)
+
+
 def nightly_binning(runs):
-    nights = runs['night'].unique()
-    bins = pd.Series(index=runs.index, dtype=int)
+    ''' One bin per night, requires the column `night` '''
+    return factorize_binning(runs, runs['night'])
 
-    for bin_id, night in enumerate(nights):
-        bins.loc[runs.night == night] = bin_id
 
-    return bins
+def night_to_date(night):
+    ''' Convert FACT night integers (e.g. 20170101) to datetimes '''
+    night = np.asarray(night)
+    return pd.to_datetime(pd.DataFrame({
+        'year': night // 10000,
+        'month': night // 100 % 100,
+        'day': night % 100,
+    }))
+
+
+def calendar_binning(runs, freq='W'):
+    '''
+    One bin per calendar period of the night of each run,
+    requires the column `night`.
+
+    Parameters
+    ----------
+    runs: pd.DataFrame
+        DataFrame containing the column `night`
+    freq: str
+        A pandas period alias, e.g. `'W'` for weeks from monday to sunday,
+        `'M'` for months or `'Y'` for years
+    '''
+    periods = night_to_date(runs['night']).dt.to_period(freq)
+    return factorize_binning(runs, periods)
+
+
+def weekly_binning(runs):
+    ''' One bin per week (monday to sunday), requires the column `night` '''
+    return calendar_binning(runs, 'W')
+
+
+def monthly_binning(runs):
+    ''' One bin per calendar month, requires the column `night` '''
+    return calendar_binning(runs, 'M')
+
+
+def moon_period_binning(runs):
+    '''
+    One bin per moon period, from one full moon to the next,
+    using the mean synodic month and `run_start`.
+    '''
+    run_start = runs['run_start']
+    if run_start.dt.tz is not None:
+        run_start = run_start.dt.tz_convert('UTC').dt.tz_localize(None)
+
+    periods = np.floor(
+        (run_start - FULL_MOON_REFERENCE) / pd.Timedelta(days=SYNODIC_MONTH_DAYS)
+    )
+    return factorize_binning(runs, periods)
+
+
+def significance_binning(runs, target_significance=3, alpha=0.2):
+    '''
+    Merge consecutive runs into a bin until the Li&Ma significance
+    of the bin reaches `target_significance`, then start a new bin.
+    The remaining runs at the end form the last bin, even if
+    they do not reach the target.
+
+    Parameters
+    ----------
+    runs: pd.DataFrame
+        DataFrame containing `n_on` and `n_off` for each run, sorted in time
+    target_significance: float
+        Li&Ma significance each bin has to reach
+    alpha: float
+        The weight for the off regions, e.g. 1 / number of off regions
+    '''
+    n_runs = len(runs)
+    cum_on = np.append(0, np.cumsum(runs['n_on'].to_numpy()))
+    cum_off = np.append(0, np.cumsum(runs['n_off'].to_numpy()))
+
+    bins = np.empty(n_runs, dtype='int64')
+    bin_number = 0
+    start = 0
+    while start < n_runs:
+        # significance for all possible ends of the bin, in windows of growing size
+        # so the cost is proportional to the length of the bin
+        window = 64
+        while True:
+            stop = min(start + window, n_runs)
+            significance = li_ma_significance(
+                cum_on[start + 1:stop + 1] - cum_on[start],
+                cum_off[start + 1:stop + 1] - cum_off[start],
+                alpha,
+            )
+            reached = np.flatnonzero(significance >= target_significance)
+            if len(reached) > 0 or stop == n_runs:
+                break
+            window *= 2
+
+        end = start + reached[0] + 1 if len(reached) > 0 else n_runs
+        bins[start:end] = bin_number
+        bin_number += 1
+        start = end
+
+    return pd.Series(bins, index=runs.index)
+
+
+def bayesian_blocks_binning(runs, alpha=0.2, p0=0.05, ncp_prior=None):
+    '''
+    Bayesian blocks (Scargle et al. 2013) on the excess rate of the runs,
+    using the fitness for point measures with gaussian errors.
+    The optimal partition is found by dynamic programming with
+    the pruning of PELT (Killick et al. 2012), which is exact here,
+    as merging two blocks never increases the fitness.
+
+    The variance of runs without any events is set to one event,
+    runs without ontime do not influence the partition.
+
+    Parameters
+    ----------
+    runs: pd.DataFrame
+        DataFrame containing `n_on`, `n_off` and `ontime` for each run,
+        sorted in time
+    alpha: float
+        The weight for the off regions, e.g. 1 / number of off regions
+    p0: float
+        Probability to find a change point in a constant light curve,
+        used to calibrate the penalty for each additional block.
+        The log likelihood gain of a single spurious change point is
+        chi2 / 2 with one degree of freedom, so with a bonferroni correction
+        for the `n_runs` possible positions the penalty is
+        `0.5 * chi2.isf(p0 / n_runs, 1)`.
+        This holds for gaussian errors, so runs need enough events.
+    ncp_prior: float or None
+        Penalty for each additional block, overrides `p0` if given
+    '''
+    n_on = runs['n_on'].to_numpy(dtype=float)
+    n_off = runs['n_off'].to_numpy(dtype=float)
+    ontime = runs['ontime'].to_numpy(dtype=float)
+    n_runs = len(runs)
+
+    if ncp_prior is None:
+        ncp_prior = 0.5 * norm.isf(p0 / (2 * max(n_runs, 1)))**2
+
+    # rate x = n_excess / ontime with error sigma = sqrt(variance) / ontime,
+    # weights a = 1 / (2 sigma^2), b = x / sigma^2
+    variance = np.maximum(n_on + alpha**2 * n_off, 1)
+    cum_a = np.append(0, np.cumsum(0.5 * ontime**2 / variance))
+    cum_b = np.append(0, np.cumsum((n_on - alpha * n_off) * ontime / variance))
+
+    # best[t]: best total fitness of the first t runs, last_start[t]: start of its last block
+    best = np.zeros(n_runs + 1)
+    last_start = np.zeros(n_runs + 1, dtype='int64')
+    candidates = np.array([0])
+
+    for t in range(1, n_runs + 1):
+        a = cum_a[t] - cum_a[candidates]
+        b = cum_b[t] - cum_b[candidates]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fitness = np.where(a > 0, b**2 / (4 * a), 0)
+
+        total = best[candidates] + fitness
+        i_max = np.argmax(total)
+        best[t] = total[i_max] - ncp_prior
+        last_start[t] = candidates[i_max]
+
+        # candidates that can not be the start of the last block anymore
+        candidates = np.append(candidates[total >= best[t]], t)
+
+    change_points = []
+    stop = n_runs
+    while stop > 0:
+        stop = last_start[stop]
+        change_points.append(stop)
+
+    starts = change_points[::-1]
+    stops = starts[1:] + [n_runs]
+    bins = np.empty(n_runs, dtype='int64')
+    for bin_number, (start, stop) in enumerate(zip(starts, stops)):
+        bins[start:stop] = bin_number
+
+    return pd.Series(bins, index=runs.index)
+
+
+def has_argument(function, name):
+    ''' Check if `function` has an argument called `name` '''
+    try:
+        return name in signature(function).parameters
+    except (TypeError, ValueError):
+        return False
 
 
 def bin_runs(
@@ -106,43 +321,194 @@ def bin_runs(
     binning_function: function
         A function that takes the run df and returns a
         pd.Series containing bin ids with the index of the origininal
-        dataframe
-
-    All `**kwargs` are passed to the binning function
+        dataframe, e.g. `ontime_binning`, `qla_binning`, `nightly_binning`,
+        `weekly_binning`, `monthly_binning`, `moon_period_binning`,
+        `significance_binning` or `bayesian_blocks_binning`.
+        It is called once per source, with the runs sorted by `run_start`.
+
+    All `**kwargs` are passed to the binning function.
+    If the binning function has an `alpha` argument, like `significance_binning`
+    and `bayesian_blocks_binning`, `alpha` is also passed to it,
+    so the bins are chosen with the same alpha as used for the statistics.
+    '''
+    runs = runs.sort_values(['source', 'run_start'])
+
+    if has_argument(binning_function, 'alpha'):
+        kwargs['alpha'] = alpha
+
+    # runs are sorted by source, so each source is a contiguous block
+    source = runs['source'].to_numpy()
+    boundaries = np.flatnonzero(source[1:] != source[:-1]) + 1
+    starts = np.append(0, boundaries)
+    stops = np.append(boundaries, len(runs))
+
+    # like assigning a column, a returned series is aligned with the runs
+    bins = np.concatenate([
+        pd.Series(
+            binning_function(runs.iloc[start:stop], **kwargs),
+            index=runs.index[start:stop],
+        ).to_numpy()
+        for start, stop in zip(starts, stops)
+    ])
+
+    binned = runs.groupby([source, bins]).aggregate({
+        'ontime': 'sum',
+        'n_on': 'sum',
+        'n_off': 'sum',
+        'run_start': 'min',
+        'run_stop': 'max',
+    })
+    binned_source = binned.index.get_level_values(0)
+    binned.index = binned.index.get_level_values(1).rename('bin')
+
+    add_bin_statistics(binned, alpha)
+    binned['source'] = binned_source.to_numpy()
+    binned['night'] = calc_night(binned.time_mean)
+
+    return binned
+
+
+class OnlineLightCurve:
     '''
-    runs = runs.sort_values(by='run_start')
-    sources = []
-    for source, df in runs.groupby('source'):
+    Incrementally bin runs as they arrive, using the same rules
+    as `ontime_binning`.
 
-        df = df.copy()
-        df['bin'] = binning_function(df, **kwargs)
+    For each source, only the state of the current bin is kept,
+    so adding a run costs O(1) independent of the length of the light curve.
+    `update` returns only the bins that were changed by the new runs,
+    in the same format as `bin_runs`.
 
-        binned = df.groupby('bin').aggregate({
-            'ontime': 'sum',
-            'n_on': 'sum',
-            'n_off': 'sum',
-            'run_start': 'min',
-            'run_stop': 'max',
-        })
+    >>> light_curve = OnlineLightCurve(bin_width_minutes=20)
+    >>> changed = light_curve.update(new_runs)
 
-        binned['n_excess'] = binned.n_on - binned.n_off * alpha
-        binned['excess_rate_per_h'] = binned.n_excess / binned.ontime * 3600
+    Parameters
+    ----------
+    bin_width_minutes: number
+        The desired amount of ontime in each bin, see `ontime_binning`
+    alpha: float
+        The weight for the off regions, e.g. 1 / number of off regions
+    '''
 
-        binned['time_width'] = binned.run_stop - binned.run_start
-        binned['time_mean'] = binned.run_start + 0.5 * binned.time_width
+    def __init__(self, bin_width_minutes=20, alpha=0.2):
+        self.bin_width_sec = bin_width_minutes * 60
+        self.delta_t_max = pd.Timedelta(seconds=self.bin_width_sec)
+        self.alpha = alpha
+        self.current_bins = {}
+
+    def update(self, runs):
+        '''
+        Add new runs and return the bins that changed.
+
+        Parameters
+        ----------
+        runs: pandas.DataFrame
+            The analysis results and necessary metadata for each new run.
+            Required are: ontime, n_on, n_off, run_start, run_stop, source.
+            Runs of a source have to start after all runs of that source
+            added before.
+        '''
+        runs = runs.sort_values('run_start', kind='mergesort')
+
+        changed = {}
+        for source, ontime, n_on, n_off, run_start, run_stop in zip(
+                runs['source'].tolist(),
+                runs['ontime'].tolist(),
+                runs['n_on'].tolist(),
+                runs['n_off'].tolist(),
+                runs['run_start'].tolist(),
+                runs['run_stop'].tolist()):
+
+            current = self.current_bins.get(source)
+
+            if current is None:
+                # like greedy_ontime_bins, a run longer than a bin skips bin 0
+                new_bin = True
+                bin_number = int(ontime > self.bin_width_sec)
+            else:
+                if run_start < current['run_start_last']:
+                    raise ValueError(
+                        'Run starting at {} is older than the last run of {}'.format(
+                            run_start, source
+                        )
+                    )
+
+                delta_t = run_start - current['run_stop_last']
+                new_bin = (
+                    current['ontime'] + ontime > self.bin_width_sec
+                    or delta_t > self.delta_t_max
+                )
+                bin_number = current['bin'] + 1
+
+            if new_bin:
+                current = {
+                    'bin': bin_number,
+                    'ontime': 0,
+                    'n_on': 0,
+                    'n_off': 0,
+                    'run_start': run_start,
+                    'run_stop': run_stop,
+                }
+                self.current_bins[source] = current
+
+            current['ontime'] += ontime
+            current['n_on'] += n_on
+            current['n_off'] += n_off
+            current['run_stop'] = max(current['run_stop'], run_stop)
+            current['run_start_last'] = run_start
+            current['run_stop_last'] = run_stop
+
+            # copy, as the current bin may change with the following runs
+            changed[(source, current['bin'])] = dict(current, source=source)
+
+        return self.to_dataframe([changed[key] for key in sorted(changed)])
+
+    def to_dataframe(self, bins):
+        '''
+        Convert a list of bin states into the format of `bin_runs`
+        '''
+        columns = ['bin', 'ontime', 'n_on', 'n_off', 'run_start', 'run_stop']
+        binned = pd.DataFrame(bins, columns=columns + ['source'])
+        source = binned.pop('source')
+        binned.set_index('bin', inplace=True)
+
+        # needed for the correct dtypes if no bins changed
+        for col in ('ontime', 'n_on', 'n_off'):
+            binned[col] = pd.to_numeric(binned[col])
+        binned['run_start'] = pd.to_datetime(binned['run_start'])
+        binned['run_stop'] = pd.to_datetime(binned['run_stop'])
+
+        add_bin_statistics(binned, self.alpha)
+        binned['source'] = source.to_numpy()
+        binned['night'] = calc_night(binned.time_mean)
+
+        return binned
+
+
+def add_bin_statistics(binned, alpha):
+    '''
+    Add excess, excess rate, significance and time columns to `binned`,
+    which needs to contain the columns
+    `ontime`, `n_on`, `n_off`, `run_start` and `run_stop`
+    '''
+    binned['n_excess'] = binned.n_on - binned.n_off * alpha
+    binned['excess_rate_per_h'] = binned.n_excess / binned.ontime * 3600
 
-        binned['excess_rate_err'] = np.sqrt(binned.n_on + alpha**2 * binned.n_off)
-        binned['excess_rate_err'] /= binned.ontime / 3600
+    binned['time_width'] = binned.run_stop - binned.run_start
+    binned['time_mean'] = binned.run_start + 0.5 * binned.time_width
 
-        binned['significance'] = li_ma_significance(
-            binned.n_on, binned.n_off, 0.2
-        )
+    binned['excess_rate_err'] = np.sqrt(binned.n_on + alpha**2 * binned.n_off)
+    binned['excess_rate_err'] /= binned.ontime / 3600
 
-        binned['source'] = source
-        binned['night'] = (
-            binned.time_mean - pd.Timedelta(hours=12)
-        ).dt.strftime('%Y%m%d').astype(int)
+    binned['significance'] = li_ma_significance(
+        binned.n_on, binned.n_off, 0.2
+    )
 
-        sources.append(binned)
 
-    return pd.concat(sources)
+def calc_night(timestamp):
+    '''
+    Calculate the FACT night integer (e.g. 20170101)
+    for a series of timestamps.
+    The night changes at noon.
+    '''
+    t = timestamp - pd.Timedelta(hours=12)
+    return (t.dt.year * 10000 + t.dt.month * 100 + t.dt.day).astype(int)
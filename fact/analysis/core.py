@@ -3,6 +3,7 @@ import pandas as pd
 import re
 
 from .statistics import li_ma_significance
+from ..io import read_h5py_chunked, H5PyAppender
 
 default_theta_off_keys = tuple('theta_deg_off_{}'.format(i) for i in range(1, 6))
 default_prediction_off_keys = tuple(
@@ -65,6 +66,17 @@ def calc_run_summary_source_independent(
     runs['n_off'] = off_data.groupby(['night', 'run_id']).size()
     runs['n_off'].fillna(0, inplace=True)
 
+    add_run_statistics(runs, alpha)
+    runs.reset_index(inplace=True)
+
+    return runs
+
+
+def add_run_statistics(runs, alpha):
+    '''
+    Add excess, excess rate and significance to `runs`,
+    which needs to contain the columns `n_on`, `n_off` and `ontime`
+    '''
     runs['n_excess'] = runs['n_on'] - alpha * runs['n_off']
     runs['n_excess_err'] = np.sqrt(runs['n_on'] + alpha**2 * runs['n_off'])
 
@@ -75,9 +87,162 @@ def calc_run_summary_source_independent(
         runs['n_on'], runs['n_off'], alpha
     )
 
-    runs.reset_index(inplace=True)
 
-    return runs
+def nearest_grid_index(grid, value, rtol=1e-9, atol=1e-12):
+    '''
+    Index of the value in `grid` closest to `value`,
+    None if it is not within the tolerance of `np.isclose`
+    '''
+    if len(grid) == 0:
+        return None
+    idx = int(np.argmin(np.abs(grid - value)))
+    if not np.isclose(grid[idx], value, rtol=rtol, atol=atol):
+        return None
+    return idx
+
+
+class CumulativeRunHistogram:
+    '''
+    Per-run cumulative event counts of the on and off regions
+    for a grid of prediction thresholds and theta² cuts.
+
+    The events are histogrammed once, after that the run summary
+    for any pair of grid values is a lookup, giving the same numbers
+    as `calc_run_summary_source_independent`.
+    This is meant for cut optimisations, where many combinations of
+    cuts are tested on the same events.
+
+    >>> hist = CumulativeRunHistogram(events, runs, np.arange(0.5, 1, 0.05), [0.01, 0.025, 0.05])
+    >>> n_on, n_off, significance = hist.scan()
+    >>> runs = hist.run_summary(0.8, 0.025)
+
+    Parameters
+    ----------
+    events: pd.DataFrame
+        DataFrame with event data, needs to contain the columns
+        `'night'`, `'run_id'`, `prediction_key`, `theta_key` and the `theta_off_keys`
+    runs: pd.DataFrame
+        DataFrame with one row per run, needs to contain
+        `'night'`, `'run_id'` and `'ontime'`
+    prediction_thresholds: array-like
+        Grid of thresholds for the classifier prediction
+    theta2_cuts: array-like
+        Grid of selection cuts for theta^2 in deg^2
+    prediction_key: str:
+        Key to the classifier prediction
+    theta_key: str
+        Column name of the column containing theta in degree
+    theta_off_keys: list[str]
+        Column names of the column containing theta  in degree
+        for all off regions
+    '''
+
+    def __init__(
+            self,
+            events,
+            runs,
+            prediction_thresholds,
+            theta2_cuts,
+            prediction_key='gamma_prediction',
+            theta_key='theta_deg',
+            theta_off_keys=default_theta_off_keys,
+            ):
+        self.runs = runs.set_index(['night', 'run_id']).sort_index().reset_index()
+        self.prediction_thresholds = np.sort(np.asanyarray(prediction_thresholds, dtype=float))
+        self.theta2_cuts = np.sort(np.asanyarray(theta2_cuts, dtype=float))
+        self.alpha = 1 / len(theta_off_keys)
+
+        run_index = pd.MultiIndex.from_frame(self.runs[['night', 'run_id']])
+        run_idx = run_index.get_indexer(
+            pd.MultiIndex.from_arrays([events['night'], events['run_id']])
+        )
+
+        # index of the highest threshold passed by each event, -1 for none
+        prediction = events[prediction_key].to_numpy()
+        threshold_idx = np.searchsorted(self.prediction_thresholds, prediction, side='right') - 1
+        threshold_idx[np.isnan(prediction)] = -1
+
+        valid = (run_idx >= 0) & (threshold_idx >= 0)
+        run_idx = run_idx[valid]
+        threshold_idx = threshold_idx[valid]
+
+        # theta is compared to the square root of the cut like in `split_on_off_source_independent`
+        theta_cuts = np.sqrt(self.theta2_cuts)
+
+        def histogram(theta):
+            # index of the smallest cut passed by each event,
+            # len(theta_cuts) if none, also for nan
+            cut_idx = np.searchsorted(theta_cuts, theta[valid], side='left')
+            shape = (len(self.runs), len(self.prediction_thresholds), len(theta_cuts) + 1)
+            counts = np.bincount(
+                np.ravel_multi_index((run_idx, threshold_idx, cut_idx), shape),
+                minlength=np.prod(shape),
+            ).reshape(shape)[:, :, :-1]
+
+            # event passes all thresholds below and all cuts above its bin
+            counts = np.cumsum(counts[:, ::-1], axis=1)[:, ::-1]
+            return np.cumsum(counts, axis=2)
+
+        self.n_on = histogram(events[theta_key].to_numpy())
+        self.n_off = sum(histogram(events[key].to_numpy()) for key in theta_off_keys)
+
+    def grid_index(self, prediction_threshold, theta2_cut):
+        '''
+        Get the indices of `prediction_threshold` and `theta2_cut` in the grid.
+        Values are matched with a small tolerance, so e.g. 0.8 is found in
+        `np.arange(0.5, 1, 0.05)`, which contains 0.8000000000000003.
+        '''
+        threshold_idx = nearest_grid_index(self.prediction_thresholds, prediction_threshold)
+        cut_idx = nearest_grid_index(self.theta2_cuts, theta2_cut)
+
+        if threshold_idx is None:
+            raise ValueError('Prediction threshold {} not in grid'.format(prediction_threshold))
+        if cut_idx is None:
+            raise ValueError('Theta² cut {} not in grid'.format(theta2_cut))
+
+        return threshold_idx, cut_idx
+
+    def run_summary(self, prediction_threshold, theta2_cut):
+        '''
+        Calculate run summaries for the given theta^2 and signal prediction cuts,
+        see `calc_run_summary_source_independent`.
+        Both cuts need to be values of the grid.
+        '''
+        threshold_idx, cut_idx = self.grid_index(prediction_threshold, theta2_cut)
+
+        runs = self.runs.copy()
+        runs['n_on'] = self.n_on[:, threshold_idx, cut_idx]
+        runs['n_off'] = self.n_off[:, threshold_idx, cut_idx]
+        add_run_statistics(runs, self.alpha)
+
+        return runs
+
+    def scan(self, runs=None):
+        '''
+        Calculate the total number of on and off events and the
+        Li&Ma significance for all combinations of cuts in the grid.
+
+        Parameters
+        ----------
+        runs: array-like
+            boolean mask for the runs (sorted by night and run_id)
+            to use, all runs are used if None
+
+        Returns
+        -------
+        n_on: np.ndarray
+        n_off: np.ndarray
+        significance: np.ndarray
+            Arrays of shape (len(prediction_thresholds), len(theta2_cuts))
+        '''
+        if runs is None:
+            runs = slice(None)
+
+        n_on = self.n_on[runs].sum(axis=0)
+        n_off = self.n_off[runs].sum(axis=0)
+        significance = li_ma_significance(n_on, n_off, self.alpha)
+
+        return n_on, n_off, significance
 
 
 def split_on_off_source_independent(
@@ -105,22 +270,174 @@ def split_on_off_source_independent(
     # apply theta2_cut
     theta_cut = np.sqrt(theta2_cut)
 
-    on_data = events.query('{} <= {}'.format(theta_key, theta_cut))
+    on_data = events[events[theta_key].to_numpy() <= theta_cut]
+
+    regions = range(1, len(theta_off_keys) + 1)
+    columns = list(events.columns) + ['off_region']
+    off_columns = [off_region_columns(columns, region) for region in regions]
+
+    # all regions must result in the same columns in the same order
+    # for the vectorized version, fall back to selecting region by region otherwise
+    if any(
+        [name for name, _ in c] != [name for name, _ in off_columns[0]]
+        for c in off_columns
+    ):
+        return on_data, split_off_by_region(events, theta_cut, theta_off_keys)
+
+    theta_off = np.column_stack([events[k].to_numpy() for k in theta_off_keys])
+    selected = theta_off <= theta_cut
+
+    # transposed, so that the result is ordered by region first, then by event
+    region_idx, event_idx = np.nonzero(selected.T)
+    n_selected = selected.sum(axis=0)
+    bounds = np.append(0, np.cumsum(n_selected))
+
+    # the resulting columns are the unchanged columns in their original order,
+    # followed by off_region and the columns replaced by their off region values
+    unchanged = {source for name, source in off_columns[0] if name == source}
+    off_data = events.take(event_idx)
+    off_data.drop(
+        [col for col in events.columns if col not in unchanged], axis=1, inplace=True
+    )
+    off_data['off_region'] = region_idx + 1
+
+    for i, (name, source) in enumerate(off_columns[0]):
+        if name == source:
+            continue
+
+        sources = [events[c[i][1]].to_numpy() for c in off_columns]
+        values = np.empty(len(event_idx), dtype=np.result_type(*sources))
+        for region, col in enumerate(sources):
+            lower, upper = bounds[region], bounds[region + 1]
+            values[lower:upper] = col[event_idx[lower:upper]]
+        off_data[name] = values
+
+    return on_data, off_data
 
+
+def split_off_by_region(events, theta_cut, theta_off_keys):
+    '''
+    Select off events for each region separately and concatenate them.
+    '''
     off_dfs = []
     for region, theta_off_key in enumerate(theta_off_keys, start=1):
-        off_df = events.query('{} <= {}'.format(
-            theta_off_key, theta_cut)
-        ).copy()
+        off_df = events[events[theta_off_key].to_numpy() <= theta_cut].copy()
 
         off_df['off_region'] = region
         drop_off_columns(off_df, region, inplace=True)
 
         off_dfs.append(off_df)
 
-    off_data = pd.concat(off_dfs)
+    return pd.concat(off_dfs)
 
-    return on_data, off_data
+
+def off_region_columns(columns, off_region):
+    '''
+    Get the columns resulting from `drop_off_columns` for `off_region`
+    as a list of tuples (name, source column)
+    '''
+    result = [(col, col) for col in columns]
+
+    def remove(name):
+        names = [n for n, _ in result]
+        if name not in names:
+            raise KeyError('{} not found in columns'.format(name))
+        del result[names.index(name)]
+
+    for col in columns:
+        m = off_key_re.match(col)
+        if m:
+            on_key, key_region = m.groups()
+            if int(key_region) == off_region:
+                remove(on_key)
+                result.append((on_key, col))
+
+            remove(col)
+
+    return result
+
+
+def split_on_off_source_independent_chunked(
+        input_path,
+        output_path,
+        theta2_cut,
+        key='events',
+        columns=None,
+        chunksize=100000,
+        theta_key='theta_deg',
+        theta_off_keys=default_theta_off_keys,
+        on_key='on',
+        off_key='off',
+        **kwargs
+        ):
+    '''
+    Split the events of an h5py style hdf5 file into on and off region,
+    like `split_on_off_source_independent`, but only one chunk of events
+    is held in memory at a time. The appenders for the on and off events
+    buffer less than `buffer_size` rows per column, which defaults to `chunksize`.
+    On and off events are appended to the groups `on_key` and `off_key`
+    of `output_path`, which is overwritten.
+    Groups are only created if they contain at least one event.
+
+    Parameters
+    ----------
+    input_path: str
+        Path to the h5py style hdf5 file with the events
+    output_path: str
+        Path to the output file
+    theta2_cut: float
+        Selection cut for theta^2 in deg^2
+    key: str
+        Group key of the events in `input_path`
+    columns: list[str]
+        Columns to read, if None, all 1d columns are read.
+        Have to include `theta_key` and `theta_off_keys`.
+    chunksize: int
+        Number of events read per chunk
+    theta_key: str
+        Column name of the column containing theta in degree
+    theta_off_keys: list[str]
+        Column names of the column containing theta  in degree
+        for all off regions
+    on_key: str
+        Group key for the on events in the output file
+    off_key: str
+        Group key for the off events in the output file
+
+    All other key word arguments, e.g. `buffer_size`,
+    are passed to `fact.io.H5PyAppender`
+
+    Returns
+    -------
+    n_on: int
+        Number of events in the on region
+    n_off: int
+        Number of events in all off regions
+    '''
+    n_on = 0
+    n_off = 0
+    kwargs.setdefault('buffer_size', chunksize)
+
+    on_appender = H5PyAppender(output_path, key=on_key, mode='w', **kwargs)
+    off_appender = H5PyAppender(output_path, key=off_key, mode='a', **kwargs)
+
+    with on_appender, off_appender:
+        for events, start, end in read_h5py_chunked(
+                input_path, key=key, columns=columns, chunksize=chunksize):
+
+            on_data, off_data = split_on_off_source_independent(
+                events, theta2_cut, theta_key, theta_off_keys
+            )
+
+            if len(on_data) > 0:
+                on_appender.append(on_data)
+                n_on += len(on_data)
+
+            if len(off_data) > 0:
+                off_appender.append(off_data)
+                n_off += len(off_data)
+
+    return n_on, n_off
 
 
 def drop_off_columns(df, off_region, inplace=False):
@@ -134,15 +451,13 @@ def drop_off_columns(df, off_region, inplace=False):
     if inplace is False:
         df = df.copy()
 
-    for col in df.columns:
-        m = off_key_re.match(col)
-        if m:
-            on_key, key_region = m.groups()
-            if int(key_region) == off_region:
-                df.drop(on_key, axis=1, inplace=True)
-                df[on_key] = df[col]
+    columns = off_region_columns(df.columns, off_region)
+    replaced = [(name, df[source]) for name, source in columns if name != source]
+    keep = {source for name, source in columns if name == source}
 
-            df.drop(col, axis=1, inplace=True)
+    df.drop([col for col in df.columns if col not in keep], axis=1, inplace=True)
+    for name, values in replaced:
+        df[name] = values
 
     if inplace is False:
         return df
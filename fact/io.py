@@ -1,73 +1,220 @@
 from os import path
+import os
+from glob import glob
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+from collections import namedtuple
 import json
+import re
+# importing tables registers the blosc filter with hdf5
 import tables
 import h5py
 import pandas as pd
+from pandas.api.types import union_categoricals
 import sys
 import logging
 import numpy as np
 from copy import copy
+from functools import lru_cache, partial
 import astropy.units as u
-import tempfile
+import time
 import warnings
+import zlib
 
 
 __all__ = [
     'write_data',
     'to_native_byteorder',
     'read_data',
+    'read_data_chunked',
+    'sniff_hdf5_format',
     'read_h5py',
     'read_h5py_chunked',
+    'read_h5py_arrays',
+    'read_h5py_many',
+    'inspect_h5py',
+    'inspect_h5py_many',
+    'arrays_to_dataframe',
     'check_extension',
     'to_h5py',
+    'H5PyAppender',
     'create_blosc_compression_options',
+    'get_default_compression',
+    'to_parquet',
+    'read_parquet',
+    'to_arrow',
+    'read_arrow',
 ]
 
 log = logging.getLogger(__name__)
 
 
-allowed_extensions = ('.hdf', '.hdf5', '.h5', '.json', '.jsonl', '.jsonlines', '.csv')
+allowed_extensions = (
+    '.hdf', '.hdf5', '.h5', '.json', '.jsonl', '.jsonlines', '.csv',
+    '.parquet', '.arrow', '.feather',
+)
 native_byteorder = native_byteorder = {'little': '<', 'big': '>'}[sys.byteorder]
 
 
+#: hdf5 filter id of the blosc filter
+BLOSC_FILTER_ID = 32001
+#: compressor names of the blosc filter by their compcode
+BLOSC_COMPRESSORS = ('blosclz', 'lz4', 'lz4hc', 'snappy', 'zlib', 'zstd')
+BLOSC_MODULE_MISSING = (
+    'the blosc python module is needed for blosc compressed datasets,'
+    ' install it using `pip install pyfact[blosc]`'
+)
+
+
 def create_blosc_compression_options(complevel=5, complib='blosc:zstd', shuffle=True):
     '''Create correct kwargs for h5py.create_dataset to use the more modern
     compression filters, default is zstandard with moderate compression settings
     See https://github.com/h5py/h5py/issues/611#issuecomment-353694301
     '''
     shuffle = 2 if shuffle == 'bit' else 1 if shuffle else 0
-    compressors = tables.filters.blosc_compressor_list()
     try:
-        complib = ['blosc:' + c for c in compressors].index(complib)
+        name = complib[len('blosc:'):] if complib.startswith('blosc:') else None
+        # the filter uses fixed codes, independent of the compressors in this build
+        compcode = BLOSC_COMPRESSORS.index(name)
     except ValueError:
         raise ValueError('Unsupported compression "{}"'.format(complib))
 
+    if name not in tables.filters.blosc_compressor_list():
+        raise ValueError('Compression "{}" not available in this blosc build'.format(complib))
+
     args = {
-        'compression': 32001,
-        'compression_opts': (0, 0, 0, 0, complevel, shuffle, complib)
+        'compression': BLOSC_FILTER_ID,
+        'compression_opts': (0, 0, 0, 0, complevel, shuffle, compcode)
     }
     if shuffle:
         args['shuffle'] = False
     return args
 
 
-DEFAULT_COMPRESSION = {}
-with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
-    try:
-        zstd_opts = create_blosc_compression_options()
-        with h5py.File(f.name, 'w') as of:
-            of.create_dataset('test', dtype='float64', shape=(1, ), **zstd_opts)
+#: Settings for `create_empty_h5py_dataset`.
+#: 'fast-read' uses the fast lz4 compressor,
+#: 'small-file' uses larger chunks, a higher compression level and bit shuffling
+H5PY_PROFILES = {
+    'balanced': {
+        'chunk_bytes': 2**20,
+        'compression': {'complib': 'blosc:zstd', 'complevel': 5, 'shuffle': True},
+    },
+    'fast-read': {
+        'chunk_bytes': 2**20,
+        'compression': {'complib': 'blosc:lz4', 'complevel': 5, 'shuffle': True},
+    },
+    'small-file': {
+        'chunk_bytes': 2**22,
+        'compression': {'complib': 'blosc:zstd', 'complevel': 9, 'shuffle': 'bit'},
+    },
+}
+
+
+#: Environment variable to override the default compression for h5py datasets.
+#: Supported values are 'auto' (default, use blosc:zstd if available),
+#: 'none', 'gzip' or a blosc compressor like 'blosc:lz4'
+COMPRESSION_ENV_VAR = 'PYFACT_H5PY_COMPRESSION'
+
+#: `read_h5py_chunked` with `align_chunks` only aligns to hdf5 chunks
+#: of at most this many times the requested chunksize
+MAX_ALIGN_FACTOR = 4
+
+#: If this environment variable is set, the result of the check for
+#: blosc support is stored in a json file in this directory,
+#: one entry per hdf5 library version
+CACHE_DIR_ENV_VAR = 'PYFACT_CACHE_DIR'
+
+
+def get_default_compression():
+    '''
+    Return the compression options used for new h5py datasets if
+    no compression is given explicitly.
+
+    By default, blosc:zstd is used if the blosc filter is available.
+    The check is only done on first use and then cached,
+    see `COMPRESSION_ENV_VAR` and `CACHE_DIR_ENV_VAR`.
+    '''
+    return dict(_default_compression(os.environ.get(COMPRESSION_ENV_VAR, 'auto')))
+
+
+@lru_cache()
+def _default_compression(setting):
+    setting = setting.lower()
+
+    if setting == 'none':
+        return {}
+
+    if setting == 'gzip':
+        return {'compression': 'gzip'}
+
+    if setting.startswith('blosc:'):
+        return create_blosc_compression_options(complib=setting)
+
+    if setting != 'auto':
+        raise ValueError('Unsupported value "{}" for {}'.format(setting, COMPRESSION_ENV_VAR))
+
+    if check_blosc_available():
+        return create_blosc_compression_options()
+
+    warnings.warn(
+        'BLOSC compression for hdf5 not available, you will not be able'
+        ' to create or read blosc compressed datasets'
+        ' make sure tables and h5py are linked against the same hdf5 library'
+        ' e.g. by installing hdf5 in your system and doing '
+        ' `pip install --no-binary=tables --no-binary=h5py tables h5py`'
+        ' or using conda'
+    )
+    return {}
 
-        DEFAULT_COMPRESSION.update(zstd_opts)
+
+def check_blosc_available():
+    '''
+    Check if h5py can write blosc compressed datasets by creating
+    one in an in-memory hdf5 file.
+    If `CACHE_DIR_ENV_VAR` is set, the result is cached on disk per hdf5 version.
+    '''
+    cache_dir = os.environ.get(CACHE_DIR_ENV_VAR)
+    cache_key = 'h5py-{}-tables-{}'.format(h5py.version.hdf5_version, tables.hdf5_version)
+
+    cache = {}
+    if cache_dir is not None:
+        cache_path = path.join(cache_dir, 'h5py_blosc.json')
+        try:
+            with open(cache_path) as f:
+                cache = json.load(f)
+        except (IOError, ValueError):
+            pass
+
+        if cache_key in cache:
+            return cache[cache_key]
+
+    try:
+        with h5py.File('blosc_probe', 'w', driver='core', backing_store=False) as f:
+            f.create_dataset(
+                'test', dtype='float64', shape=(1, ),
+                **create_blosc_compression_options()
+            )
+        available = True
     except ValueError:
-        warnings.warn(
-            'BLOSC compression for hdf5 not available, you will not be able'
-            ' to create or read blosc compressed datasets'
-            ' make sure tables and h5py are linked against the same hdf5 library'
-            ' e.g. by installing hdf5 in your system and doing '
-            ' `pip install --no-binary=tables --no-binary=h5py tables h5py`'
-            ' or using conda'
-        )
+        available = False
+
+    if cache_dir is not None:
+        cache[cache_key] = available
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(cache_path, 'w') as f:
+                json.dump(cache, f)
+        except IOError:
+            log.debug('Could not write cache file {}'.format(cache_path))
+
+    return available
+
+
+def __getattr__(name):
+    # DEFAULT_COMPRESSION is determined lazily on first access (PEP 562, python >= 3.7)
+    if name == 'DEFAULT_COMPRESSION':
+        return get_default_compression()
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
 
 
 def write_data(df, file_path, key='data', use_h5py=True, **kwargs):
@@ -82,6 +229,9 @@ def write_data(df, file_path, key='data', use_h5py=True, **kwargs):
         * json, if extension is json
         * jsonlines if extension is `jsonl` or `jsonline`
         * csv, if extension is `csv`
+        * parquet, if extension is `parquet`, using `to_parquet`
+        * arrow ipc (feather v2), if extension is `arrow` or `feather`,
+          using `to_arrow`
 
     Arguments
     ---------
@@ -116,6 +266,12 @@ def write_data(df, file_path, key='data', use_h5py=True, **kwargs):
         index = kwargs.pop('index', False)
         df.to_csv(file_path, index=index, **kwargs)
 
+    elif extension == '.parquet':
+        to_parquet(df, file_path, **kwargs)
+
+    elif extension in ('.arrow', '.feather'):
+        to_arrow(df, file_path, **kwargs)
+
     else:
         raise IOError(
             'cannot write tabular data with format {}. Allowed formats: {}'.format(
@@ -141,7 +297,11 @@ def read_h5py(
         mode='r',
         parse_dates=True,
         first=None,
-        last=None):
+        last=None,
+        where=None,
+        memmap=False,
+        categorical=False,
+        n_threads=1):
     '''
     Read a hdf5 file written with h5py into a dataframe
 
@@ -159,42 +319,689 @@ def read_h5py(
         first row to read from the file
     last: int or None
         last event to read from the file
+    where: str, array-like or None
+        If given, only read the selected rows. Can be
+        a query string as understood by `pd.DataFrame.eval`,
+        e.g. `'gamma_prediction >= 0.8'`, which is evaluated in chunks
+        reading only the columns used in the expression,
+        a boolean mask or an array of row indices.
+        Masks and indices are relative to `first`.
+        The returned dataframe is indexed by the selected row numbers.
+        See `select_h5py_rows`.
+    memmap: bool
+        If True, uncompressed datasets with contiguous storage,
+        e.g. written by `to_h5py(..., contiguous=True)`, are accessed
+        using `np.memmap` instead of reading them through hdf5.
+        Note that building the dataframe might still copy the data,
+        use `read_h5py_arrays` to get the memory mapped arrays directly.
+    categorical: bool or iterable[str]
+        String columns to decode into a `pd.Categorical` instead
+        of an array of python strings. This saves a lot of memory
+        for columns with few distinct values like source names.
+        If True, all string columns are decoded as categorical.
+        Columns written with `to_h5py(..., encode_categoricals=True)`
+        are always returned as categorical.
+    n_threads: int or None
+        If not 1, decompress the chunks of each dataset in a pool of
+        this many threads, None uses all cpus.
+        See `read_h5py_dataset_threaded` for the supported datasets.
+    '''
+    with h5py.File(file_path, mode) as f:
+        group = get_h5py_group(f, key)
+        df = read_h5py_group(
+            group,
+            columns=columns,
+            parse_dates=parse_dates,
+            first=first,
+            last=last,
+            where=where,
+            memmap=memmap,
+            categorical=categorical,
+            n_threads=n_threads,
+        )
 
+    return df
+
+
+def get_h5py_group(f, key):
+    '''
+    Get group `key` from the opened h5py file `f`, raise an
+    IOError if it does not exist
+    '''
+    group = f.get(key)
+    if group is None:
+        raise IOError('File does not contain group "{}"'.format(key))
+    return group
+
+
+def read_h5py_group(
+        group,
+        columns=None,
+        parse_dates=True,
+        first=None,
+        last=None,
+        where=None,
+        memmap=False,
+        categorical=False,
+        n_threads=1):
+    '''
+    Read datasets from an already opened h5py group into a dataframe.
+    See `read_h5py` for the meaning of the parameters.
+    '''
+    rows = None
+    if where is not None:
+        rows = select_h5py_rows(group, where, first=first, last=last)
+
+    arrays = read_h5py_group_arrays(
+        group,
+        columns=columns,
+        parse_dates=parse_dates,
+        first=first,
+        last=last,
+        rows=rows,
+        memmap=memmap,
+        categorical=categorical,
+        n_threads=n_threads,
+    )
+    df = arrays_to_dataframe(arrays)
+
+    if rows is not None and 'index' not in arrays:
+        df.index = rows
+
+    return df
+
+
+def read_h5py_arrays(
+        file_path,
+        key='data',
+        columns=None,
+        mode='r',
+        parse_dates=True,
+        first=None,
+        last=None,
+        where=None,
+        memmap=False,
+        categorical=False,
+        n_threads=1):
+    '''
+    Read a hdf5 file written with h5py into a dict of numpy arrays.
+    In contrast to `read_h5py`, no DataFrame is built and
+    2d datasets are kept as 2d arrays.
+    Numeric datasets are read directly into preallocated arrays
+    using `h5py.Dataset.read_direct`.
+
+    Use `arrays_to_dataframe` to convert the result into the
+    same DataFrame `read_h5py` would return.
+
+    Parameters
+    ----------
+    file_path: str
+        file to read in
+    key: str
+        name of the hdf5 group to read in
+    columns: iterable[str]
+        Names of the datasets to read in. If not given read all 1d datasets
+    parse_dates: bool
+        Convert columns with attrs['timeformat'] to datetime64
+    first: int or None
+        first row to read from the file
+    last: int or None
+        last event to read from the file
+    where: str, array-like or None
+        Only read the selected rows, see `read_h5py`
+    memmap: bool
+        If True, return read-only memory mapped arrays for uncompressed,
+        contiguous datasets of fixed size types, e.g. written by
+        `to_h5py(..., contiguous=True)`. Their data is only loaded
+        from disk when accessed. All other datasets are read normally.
+    categorical: bool or iterable[str]
+        String columns to return as `pd.Categorical`, see `read_h5py`
+    n_threads: int or None
+        Number of threads used to decompress chunks, see `read_h5py`
+
+    Returns
+    -------
+    arrays: dict[str, np.ndarray]
+        Mapping of dataset name to data
     '''
     with h5py.File(file_path, mode) as f:
-        group = f.get(key)
-        if group is None:
-            raise IOError('File does not contain group "{}"'.format(key))
+        group = get_h5py_group(f, key)
 
-        # get all columns of which don't have more than one value per row
-        if columns is None:
-            columns = [col for col in group.keys() if group[col].ndim == 1]
+        rows = None
+        if where is not None:
+            rows = select_h5py_rows(group, where, first=first, last=last)
+
+        arrays = read_h5py_group_arrays(
+            group,
+            columns=columns,
+            parse_dates=parse_dates,
+            first=first,
+            last=last,
+            rows=rows,
+            memmap=memmap,
+            categorical=categorical,
+            n_threads=n_threads,
+        )
+
+    return arrays
+
+
+def read_h5py_group_arrays(
+        group,
+        columns=None,
+        parse_dates=True,
+        first=None,
+        last=None,
+        rows=None,
+        memmap=False,
+        categorical=False,
+        n_threads=1):
+    '''
+    Read datasets from an already opened h5py group into a dict of arrays.
+    See `read_h5py_arrays` for the meaning of the parameters.
+    If `rows` is given, it has to be a sorted array of row indices
+    and only these rows are read, `first` and `last` are ignored in that case.
+    '''
+    # get all columns of which don't have more than one value per row
+    if columns is None:
+        columns = [col for col in group.keys() if group[col].ndim == 1]
+
+    arrays = {}
+    for col in columns:
+        dataset = group[col]
+        if dataset.ndim > 2:
+            log.warning('Skipping column {}, not 1d or 2d'.format(col))
+            continue
+
+        mapped = memmap_h5py_dataset(dataset) if memmap else None
+
+        if mapped is not None:
+            array = mapped[first:last] if rows is None else mapped[rows]
+        elif rows is None:
+            array = read_h5py_dataset(dataset, first=first, last=last, n_threads=n_threads)
         else:
-            columns = copy(columns)
+            array = read_h5py_dataset_rows(dataset, rows)
 
-        df = pd.DataFrame()
-        for col in columns:
-            dataset = group[col]
-            array = to_native_byteorder(dataset[first:last])
+        if 'categories' in dataset.attrs:
+            array = pd.Categorical.from_codes(
+                array, categories=decode_h5py_strings(dataset.attrs['categories'])
+            )
 
-            # decode unicode strings to str
-            if array.dtype.kind in {'S', 'O'}:
+        elif array.dtype.kind in {'S', 'O'}:
+            if categorical is True or (categorical and col in categorical):
+                array = decode_categorical(array)
+            else:
+                # decode unicode strings to str
                 array = array.astype('U')
 
-            if parse_dates and dataset.attrs.get('timeformat') is not None:
-                array = pd.to_datetime(array, infer_datetime_format=True)
+        if parse_dates and dataset.attrs.get('timeformat') is not None:
+            array = parse_h5py_dates(array, dataset.attrs)
+
+        arrays[col] = array
+
+    return arrays
+
+
+def decode_categorical(array):
+    '''
+    Decode an array of byte strings into a `pd.Categorical`.
+    Only the distinct values are decoded to python strings.
+    '''
+    if array.dtype.kind == 'S':
+        categories, codes = np.unique(array, return_inverse=True)
+    else:
+        codes, categories = pd.factorize(array, sort=True)
+
+    return pd.Categorical.from_codes(codes, categories=decode_h5py_strings(categories))
 
-            if array.ndim == 1:
-                df[col] = array
-            elif array.ndim == 2:
-                for i in range(array.shape[1]):
-                    df[col + '_{}'.format(i)] = array[:, i]
-            else:
-                log.warning('Skipping column {}, not 1d or 2d'.format(col))
 
-        if 'index' in df.columns:
-            df.set_index('index', inplace=True)
-            df.index.name = None
+def decode_h5py_strings(array):
+    ''' Decode an array of strings or bytes to an array of str '''
+    return np.array([
+        s.decode() if isinstance(s, bytes) else s
+        for s in np.asarray(array).tolist()
+    ])
+
+
+def parse_h5py_dates(array, attrs):
+    '''
+    Convert data of a dataset with a `timeformat` attribute to datetime64[ns].
+    Supported formats are `iso`, strings parsed by `pd.to_datetime`
+    and `unix`, integer offsets to the unix epoch in units of `attrs['unit']`.
+    '''
+    timeformat = attrs['timeformat']
+    if isinstance(timeformat, bytes):
+        timeformat = timeformat.decode()
+
+    if timeformat == 'unix':
+        unit = attrs.get('unit', 'ns')
+        if isinstance(unit, bytes):
+            unit = unit.decode()
+        return array.astype('datetime64[{}]'.format(unit)).astype('datetime64[ns]')
+
+    return pd.to_datetime(array, infer_datetime_format=True).values
+
+
+def read_h5py_dataset(dataset, first=None, last=None, n_threads=1):
+    '''
+    Read rows `first` to `last` of an h5py dataset into a new array in
+    native byteorder. Fixed size datatypes are read directly into
+    a preallocated array, avoiding intermediate copies.
+
+    If `n_threads` is not 1, chunks are decompressed in parallel,
+    see `read_h5py_dataset_threaded`.
+    '''
+    if dataset.dtype.kind == 'O':
+        return to_native_byteorder(dataset[first:last])
+
+    if n_threads != 1:
+        array = read_h5py_dataset_threaded(dataset, first, last, n_threads=n_threads)
+        if array is not None:
+            return array
+
+    start, stop, _ = slice(first, last).indices(dataset.shape[0])
+    n_rows = max(stop - start, 0)
+
+    array = np.empty((n_rows, ) + dataset.shape[1:], dtype=native_dtype(dataset.dtype))
+    if n_rows > 0:
+        dataset.read_direct(array, np.s_[start:stop])
+
+    return array
+
+
+def read_h5py_dataset_threaded(dataset, first=None, last=None, n_threads=None):
+    '''
+    Read rows `first` to `last` of an h5py dataset, decompressing
+    the chunks in a thread pool.
+
+    The raw chunks are read with `read_direct_chunk` and decompressed
+    in python, which releases the GIL, into one preallocated array.
+    This is only possible for datasets chunked along the first axis only,
+    with fixed size types and a filter pipeline supported
+    by `h5py_chunk_decoder`. It also needs hdf5 >= 1.10.5.
+    Otherwise, None is returned.
+
+    Parameters
+    ----------
+    dataset: h5py.Dataset
+        The dataset to read
+    first: int or None
+        first row to read
+    last: int or None
+        last row to read
+    n_threads: int or None
+        Number of threads, None or -1 uses the number of cpus
+    '''
+    if dataset.chunks is None or dataset.dtype.kind == 'O':
+        return None
+
+    if tuple(dataset.chunks[1:]) != tuple(dataset.shape[1:]):
+        return None
+
+    if not h5py_direct_chunk_supported(dataset):
+        return None
+
+    decode = h5py_chunk_decoder(dataset)
+    if decode is None:
+        return None
+
+    if n_threads is None or n_threads == -1:
+        n_threads = os.cpu_count()
+
+    start, stop, _ = slice(first, last).indices(dataset.shape[0])
+    n_rows = max(stop - start, 0)
+    out = np.empty((n_rows, ) + dataset.shape[1:], dtype=native_dtype(dataset.dtype))
+
+    chunk_shape = dataset.chunks
+    chunk_rows = chunk_shape[0]
+    zeros = (0, ) * (dataset.ndim - 1)
+
+    def read_chunk(chunk_start):
+        lo = max(start, chunk_start)
+        hi = min(stop, chunk_start + chunk_rows)
+
+        raw_chunk = read_h5py_raw_chunk(dataset, (chunk_start, ) + zeros)
+        if raw_chunk is None:
+            out[lo - start:hi - start] = dataset.fillvalue
+            return
+
+        filter_mask, raw = raw_chunk
+        chunk = np.frombuffer(decode(raw, filter_mask), dtype=dataset.dtype)
+        chunk = chunk.reshape(chunk_shape)
+        out[lo - start:hi - start] = chunk[lo - chunk_start:hi - chunk_start]
+
+    chunk_starts = range(start // chunk_rows * chunk_rows, stop, chunk_rows)
+    with ThreadPoolExecutor(max_workers=n_threads) as pool:
+        # list to raise possible exceptions
+        list(pool.map(read_chunk, chunk_starts))
+
+    return out
+
+
+@lru_cache()
+def log_threaded_fallback(reason):
+    '''
+    Log why chunks can not be (de)compressed in threads,
+    only once per reason
+    '''
+    log.warning('Falling back to single threaded hdf5 io: {}'.format(reason))
+
+
+def h5py_direct_chunk_supported(dataset):
+    '''
+    Check if the direct chunk access needed by the threaded
+    reading and writing is available, it needs hdf5 >= 1.10.5
+    '''
+    methods = ('read_direct_chunk', 'write_direct_chunk', 'get_chunk_info_by_coord')
+    if all(hasattr(dataset.id, m) for m in methods):
+        return True
+
+    log_threaded_fallback('direct chunk access needs hdf5 >= 1.10.5, found {}'.format(
+        h5py.version.hdf5_version
+    ))
+    return False
+
+
+def read_h5py_raw_chunk(dataset, offset):
+    '''
+    Read the raw chunk of `dataset` starting at `offset`,
+    returns a tuple (filter_mask, raw bytes) or None if the chunk was never written.
+
+    `read_direct_chunk` must not be called for chunks that were never written,
+    as hdf5 does not set the chunk size for these.
+    '''
+    info = dataset.id.get_chunk_info_by_coord(offset)
+    if info.byte_offset is None:
+        return None
+    return dataset.id.read_direct_chunk(offset)
+
+
+def h5py_chunk_decoder(dataset):
+    '''
+    Return a function `decode(raw, filter_mask)` to decode the raw chunks of `dataset`
+    as returned by `read_direct_chunk` or None if the filter pipeline is not supported.
+
+    Supported are the shuffle filter, followed by either gzip or blosc compression.
+    Blosc requires the `blosc` python module.
+    '''
+    steps = []
+    for i, (code, cd_values) in enumerate(h5py_filters(dataset)):
+        if code == h5py.h5z.FILTER_SHUFFLE and i == 0:
+            itemsize = dataset.dtype.itemsize
+
+            def step(data):
+                data = np.frombuffer(data, dtype=np.uint8)
+                return data.reshape(itemsize, -1).T.tobytes()
+
+        elif code == h5py.h5z.FILTER_DEFLATE:
+            step = zlib.decompress
+
+        elif code == BLOSC_FILTER_ID:
+            try:
+                import blosc
+            except ImportError:
+                log_threaded_fallback(BLOSC_MODULE_MISSING)
+                return None
+            step = blosc.decompress
+
+        else:
+            log_threaded_fallback('unsupported hdf5 filter {}'.format(code))
+            return None
+
+        steps.append((i, step))
+
+    def decode(raw, filter_mask=0):
+        data = raw
+        for i, step in reversed(steps):
+            # filters are skipped if they failed for a chunk
+            if not filter_mask & (1 << i):
+                data = step(data)
+        return data
+
+    return decode
+
+
+def h5py_chunk_encoder(dataset):
+    '''
+    Return a function `encode(data)` to encode a chunk of `dataset` the same way
+    the hdf5 filter pipeline would do it or None if the pipeline is not supported.
+    See `h5py_chunk_decoder` for the supported filters.
+    '''
+    steps = []
+    for i, (code, cd_values) in enumerate(h5py_filters(dataset)):
+        if code == h5py.h5z.FILTER_SHUFFLE and i == 0:
+            itemsize = dataset.dtype.itemsize
+
+            def step(data):
+                data = np.frombuffer(data, dtype=np.uint8)
+                return data.reshape(-1, itemsize).T.tobytes()
+
+        elif code == h5py.h5z.FILTER_DEFLATE:
+            level = cd_values[0] if len(cd_values) > 0 else 4
+            step = partial(zlib.compress, level=level)
+
+        elif code == BLOSC_FILTER_ID:
+            try:
+                import blosc
+            except ImportError:
+                log_threaded_fallback(BLOSC_MODULE_MISSING)
+                return None
+
+            clevel, shuffle, compcode = cd_values[4:7]
+            step = partial(
+                blosc.compress,
+                typesize=dataset.dtype.itemsize,
+                clevel=clevel,
+                shuffle=shuffle,
+                cname=BLOSC_COMPRESSORS[compcode],
+            )
+
+        else:
+            log_threaded_fallback('unsupported hdf5 filter {}'.format(code))
+            return None
+
+        steps.append(step)
+
+    def encode(data):
+        for step in steps:
+            data = step(data)
+        return data
+
+    return encode
+
+
+def h5py_filters(dataset):
+    ''' Return a list of (filter_id, cd_values) for the filter pipeline of `dataset` '''
+    plist = dataset.id.get_create_plist()
+    filters = []
+    for i in range(plist.get_nfilters()):
+        code, flags, cd_values, name = plist.get_filter(i)
+        filters.append((code, cd_values))
+    return filters
+
+
+def memmap_h5py_dataset(dataset):
+    '''
+    Memory map an h5py dataset, returns None if this
+    is not possible, because the dataset is chunked, compressed,
+    not yet allocated or has a variable length type.
+    '''
+    if dataset.chunks is not None or dataset.dtype.kind == 'O':
+        return None
+
+    if dataset.file.driver != 'sec2':
+        return None
+
+    offset = dataset.id.get_offset()
+    if offset is None:
+        return None
+
+    return np.memmap(
+        dataset.file.filename,
+        mode='r',
+        dtype=dataset.dtype,
+        offset=offset,
+        shape=dataset.shape,
+    )
+
+
+def native_dtype(dtype):
+    ''' Return `dtype` in native byteorder '''
+    if dtype.byteorder not in ('|', '=', native_byteorder):
+        return dtype.newbyteorder('=')
+    return dtype
+
+
+def h5py_block_rows(dataset, min_rows=2**16):
+    '''
+    Number of rows to read at once when iterating over `dataset`
+    in blocks. This is a multiple of the on-disk chunk size
+    with at least `min_rows` rows.
+    '''
+    if dataset.chunks is None:
+        return min_rows
+    chunk_rows = dataset.chunks[0]
+    return int(np.ceil(min_rows / chunk_rows)) * chunk_rows
+
+
+def read_h5py_dataset_rows(dataset, rows):
+    '''
+    Read the rows with the given indices from an h5py dataset.
+
+    `rows` has to be sorted in ascending order.
+    The dataset is read in blocks aligned to the on-disk chunks,
+    from each block only the range spanned by the selected rows is read.
+    Memory usage is bounded by the output plus one block.
+    '''
+    rows = np.asarray(rows, dtype=np.int64)
+    out = np.empty((len(rows), ) + dataset.shape[1:], dtype=native_dtype(dataset.dtype))
+    if len(rows) == 0:
+        return out
+
+    block_rows = h5py_block_rows(dataset)
+    edges = np.arange(
+        rows[0] // block_rows * block_rows,
+        rows[-1] + block_rows + 1,
+        block_rows,
+    )
+    bounds = np.searchsorted(rows, edges)
+
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        if lo == hi:
+            continue
+
+        first, last = rows[lo], rows[hi - 1] + 1
+        if last - first == hi - lo:
+            # contiguous range, read directly into the output
+            out[lo:hi] = read_h5py_dataset(dataset, first, last)
+        else:
+            out[lo:hi] = read_h5py_dataset(dataset, first, last)[rows[lo:hi] - first]
+
+    return out
+
+
+def select_h5py_rows(group, where, first=None, last=None):
+    '''
+    Return the sorted indices of the rows in the range `first` to `last`
+    of `group` that are selected by `where`.
+
+    Parameters
+    ----------
+    group: h5py.Group
+        The opened group
+    where: str or array-like
+        If a string, it is evaluated using `pd.DataFrame.eval`
+        on blocks of the data, only the datasets referenced
+        in the expression are read.
+        If a boolean array, it is used as mask for the rows in `first:last`.
+        If an integer array, it gives the indices of the rows,
+        relative to `first`.
+    first: int or None
+        first row to consider
+    last: int or None
+        last row to consider
+
+    Returns
+    -------
+    rows: np.ndarray[int]
+        The absolute row indices of the selected rows
+    '''
+    n_rows = group[next(iter(group.keys()))].shape[0]
+    start, stop, _ = slice(first, last).indices(n_rows)
+    stop = max(start, stop)
+
+    if not isinstance(where, str):
+        where = np.asarray(where)
+        if where.dtype == bool:
+            if len(where) != stop - start:
+                raise ValueError('Length of mask does not match number of rows')
+            return start + np.flatnonzero(where)
+
+        rows = np.unique(where.astype(np.int64))
+        if len(rows) > 0 and (rows[0] < 0 or rows[-1] >= stop - start):
+            raise IndexError('Row indices out of range')
+        return start + rows
+
+    columns = h5py_expression_columns(group, where)
+    if len(columns) == 0:
+        raise ValueError('Expression "{}" does not use any dataset'.format(where))
+
+    block_rows = min(h5py_block_rows(group[col]) for col in columns)
+    selected = []
+    for block_start in range(start, stop, block_rows):
+        block_stop = min(block_start + block_rows, stop)
+        df = read_h5py_group(
+            group, columns=columns, first=block_start, last=block_stop,
+        )
+        mask = np.asarray(df.eval(where), dtype=bool)
+        selected.append(block_start + np.flatnonzero(mask))
+
+    if len(selected) == 0:
+        return np.array([], dtype=np.int64)
+
+    return np.concatenate(selected)
+
+
+def h5py_expression_columns(group, expression):
+    '''
+    Find the datasets in `group` that are needed to evaluate `expression`.
+    Names of the form `<name>_<i>` refer to columns of 2d datasets.
+    '''
+    names = set(re.findall(r'[A-Za-z_][A-Za-z0-9_]*', expression))
+
+    columns = []
+    for col in group.keys():
+        if col in names:
+            columns.append(col)
+        elif group[col].ndim == 2:
+            if any(re.fullmatch(re.escape(col) + r'_[0-9]+', name) for name in names):
+                columns.append(col)
+
+    return columns
+
+
+def arrays_to_dataframe(arrays):
+    '''
+    Build a DataFrame from a dict of arrays as returned by `read_h5py_arrays`.
+    2d arrays are split into one column per entry, named `<name>_<i>`.
+    If an array named `index` is present, it is used as index.
+    The DataFrame is constructed in one go instead of adding column by column.
+    '''
+    data = {}
+    for col, array in arrays.items():
+        if array.ndim == 1:
+            data[col] = array
+        elif array.ndim == 2:
+            for i in range(array.shape[1]):
+                data[col + '_{}'.format(i)] = array[:, i]
+        else:
+            log.warning('Skipping column {}, not 1d or 2d'.format(col))
+
+    df = pd.DataFrame(data)
+
+    if 'index' in df.columns:
+        df.set_index('index', inplace=True)
+        df.index.name = None
 
     return df
 
@@ -202,12 +1009,158 @@ def read_h5py(
 def h5py_get_n_rows(file_path, key='data', mode='r'):
 
     with h5py.File(file_path, mode) as f:
-        group = f.get(key)
+        group = get_h5py_group(f, key)
+        return group[next(iter(group.keys()))].shape[0]
 
-        if group is None:
-            raise IOError('File does not contain group "{}"'.format(key))
 
-        return group[next(iter(group.keys()))].shape[0]
+H5PyColumn = namedtuple('H5PyColumn', [
+    'name', 'dtype', 'shape', 'chunks', 'compression', 'compression_opts', 'timeformat', 'attrs'
+])
+H5PySchema = namedtuple('H5PySchema', ['path', 'key', 'n_rows', 'columns'])
+
+# cache for inspect_h5py_many, maps (path, key) to (mtime, size, schema)
+_schema_cache = {}
+
+
+def inspect_h5py(file_path, key='data'):
+    '''
+    Get the schema of a group in an h5py style hdf5 file
+    without reading any data.
+
+    Parameters
+    ----------
+    file_path: str
+        file to inspect
+    key: str
+        name of the hdf5 group
+
+    Returns
+    -------
+    schema: H5PySchema
+        namedtuple with the fields `path`, `key`, `n_rows` and `columns`,
+        a dict mapping dataset names to `H5PyColumn` namedtuples
+        with the fields `name`, `dtype`, `shape`, `chunks`, `compression`,
+        `compression_opts`, `timeformat` and `attrs`.
+    '''
+    with h5py.File(file_path, 'r') as f:
+        group = get_h5py_group(f, key)
+
+        columns = {}
+        for name, dataset in group.items():
+            if not isinstance(dataset, h5py.Dataset):
+                continue
+            attrs = {k: v for k, v in dataset.attrs.items()}
+            compression = dataset.compression
+            compression_opts = dataset.compression_opts
+
+            filters = dict(h5py_filters(dataset))
+            if BLOSC_FILTER_ID in filters:
+                compcode = filters[BLOSC_FILTER_ID][6]
+                compression = 'blosc:' + BLOSC_COMPRESSORS[compcode]
+                compression_opts = tuple(filters[BLOSC_FILTER_ID])
+
+            columns[name] = H5PyColumn(
+                name=name,
+                dtype=dataset.dtype,
+                shape=dataset.shape,
+                chunks=dataset.chunks,
+                compression=compression,
+                compression_opts=compression_opts,
+                timeformat=attrs.get('timeformat'),
+                attrs=attrs,
+            )
+
+    lengths = {c.shape[0] for c in columns.values() if len(c.shape) > 0}
+    if len(lengths) > 1:
+        log.warning('Datasets in {}/{} have different lengths: {}'.format(
+            file_path, key, sorted(lengths)
+        ))
+    n_rows = min(lengths) if len(lengths) > 0 else 0
+
+    return H5PySchema(path=file_path, key=key, n_rows=n_rows, columns=columns)
+
+
+def inspect_h5py_many(paths, key='data', n_jobs=1):
+    '''
+    Get the schemas of many h5py style hdf5 files, see `inspect_h5py`.
+    Results are cached in memory and only recomputed if
+    the modification time or size of a file changed.
+
+    Parameters
+    ----------
+    paths: str or iterable[str]
+        A directory, in which all hdf5 files are inspected,
+        a glob pattern or a list of file paths
+    key: str
+        name of the hdf5 group
+    n_jobs: int
+        Number of processes to use for files not in the cache,
+        -1 uses all cpus.
+
+    Returns
+    -------
+    schemas: dict[str, H5PySchema]
+        The schema for each file, in the order of `paths`
+    '''
+    if isinstance(paths, str):
+        if path.isdir(paths):
+            paths = sorted(
+                path.join(paths, f) for f in os.listdir(paths)
+                if path.splitext(f)[1] in ('.hdf', '.hdf5', '.h5')
+            )
+        else:
+            paths = sorted(glob(paths))
+
+    schemas = {}
+    todo = []
+    for file_path in paths:
+        stat = os.stat(file_path)
+        cached = _schema_cache.get((path.abspath(file_path), key))
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            schemas[file_path] = cached[2]
+        else:
+            schemas[file_path] = None
+            todo.append((file_path, stat))
+
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+
+    if n_jobs == 1 or len(todo) <= 1:
+        results = [inspect_h5py(file_path, key) for file_path, _ in todo]
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(todo))) as pool:
+            results = list(pool.map(
+                inspect_h5py, [file_path for file_path, _ in todo], repeat(key)
+            ))
+
+    for (file_path, stat), schema in zip(todo, results):
+        _schema_cache[(path.abspath(file_path), key)] = (stat.st_mtime_ns, stat.st_size, schema)
+        schemas[file_path] = schema
+
+    log.info('Inspected {} files, {} from cache'.format(len(schemas), len(schemas) - len(todo)))
+
+    return schemas
+
+
+def h5py_get_chunk_rows(group, columns, max_rows=None):
+    '''
+    Return the number of rows in one on-disk chunk of the given columns.
+    If datasets use different chunk shapes, the largest number of chunk rows
+    is returned, ignoring datasets with more than `max_rows` rows per chunk.
+    For chunks planned by `plan_h5py_chunks`, the chunk rows are powers of two,
+    so a block of this size ends on a chunk boundary for every column.
+    Returns None if none of the datasets is (suitably) chunked.
+    '''
+    chunk_rows = [
+        int(group[col].chunks[0]) for col in columns
+        if group[col].chunks is not None
+    ]
+    if max_rows is not None:
+        chunk_rows = [rows for rows in chunk_rows if rows <= max_rows]
+
+    if len(chunk_rows) == 0:
+        return None
+    return max(chunk_rows)
 
 
 def read_h5py_chunked(
@@ -216,113 +1169,701 @@ def read_h5py_chunked(
         columns=None,
         chunksize=None,
         mode='r',
-        parse_dates=True):
+        parse_dates=True,
+        align_chunks=False):
     '''
     Generator function to read from h5py hdf5 in chunks,
     returns an iterator over pandas dataframes.
+    The file is opened only once and kept open while iterating.
 
     When chunksize is None, use 1 chunk
+
+    If `align_chunks` is True, chunksize is rounded up to a multiple
+    of the number of rows in one on-disk hdf5 chunk, so that no
+    hdf5 chunk has to be decompressed twice.
+    Datasets with more than `MAX_ALIGN_FACTOR * chunksize` rows per
+    hdf5 chunk are ignored for the alignment, so the chunks read
+    are never larger than that.
     '''
     with h5py.File(file_path, mode) as f:
-        group = f.get(key)
-        if group is None:
-            raise IOError('File does not contain group "{}"'.format(key))
+        group = get_h5py_group(f, key)
 
         # get all columns of which don't have more than one value per row
         if columns is None:
             columns = [col for col in group.keys() if group[col].ndim == 1]
         else:
-            columns = copy(columns)
+            columns = copy(columns)
+
+        n_rows = group[next(iter(group.keys()))].shape[0]
+
+        if chunksize is None:
+            n_chunks = 1
+            chunksize = n_rows
+        else:
+            if align_chunks:
+                chunk_rows = h5py_get_chunk_rows(
+                    group, columns, max_rows=MAX_ALIGN_FACTOR * chunksize
+                )
+                if chunk_rows is not None:
+                    chunksize = -(-chunksize // chunk_rows) * chunk_rows
+            n_chunks = int(np.ceil(n_rows / chunksize))
+            log.info('Splitting data into {} chunks'.format(n_chunks))
+
+        for col in copy(columns):
+            if group[col].ndim > 2:
+                columns.remove(col)
+                log.warning('Ignoring column {}, not 1d or 2d'.format(col))
+
+        read_time = 0
+        for chunk in range(n_chunks):
+
+            start = chunk * chunksize
+            end = min(n_rows, (chunk + 1) * chunksize)
+
+            t0 = time.perf_counter()
+            df = read_h5py_group(
+                group,
+                columns=columns,
+                parse_dates=parse_dates,
+                first=start,
+                last=end
+            )
+            df.index = np.arange(start, end)
+            read_time += time.perf_counter() - t0
+
+            yield df, start, end
+
+        if read_time > 0:
+            log.info('Read {} rows in {:.2f} s ({:.0f} rows/s)'.format(
+                n_rows, read_time, n_rows / read_time
+            ))
+
+
+def read_h5py_many(
+        paths,
+        columns=None,
+        key='data',
+        n_jobs=1,
+        parse_dates=True,
+        where=None,
+        file_column=None,
+        categorical=False):
+    '''
+    Read the same group from many h5py hdf5 files into one dataframe.
+
+    The files are read in a process pool and the results are copied
+    into one preallocated array per column, the dataframe is built once
+    at the end. The order of the rows follows the order of `paths`.
+
+    Parameters
+    ----------
+    paths: str or iterable[str]
+        Either a list of file paths or a glob pattern like `'data/*.hdf5'`,
+        the matching files of a pattern are read in sorted order.
+    columns: iterable[str]
+        Names of the datasets to read in. If not given read all 1d datasets
+    key: str
+        name of the hdf5 group to read in
+    n_jobs: int
+        Number of processes to use. -1 uses all cpus, 1 reads
+        all files in the current process.
+    parse_dates: bool
+        Convert columns with attrs['timeformat'] to timestamps
+    where: str or None
+        If given, a query string to select rows, see `read_h5py`
+    file_column: str or None
+        If given, add a categorical column with this name,
+        containing the path of the file each row was read from
+    categorical: bool or iterable[str]
+        String columns to return as `pd.Categorical`, see `read_h5py`
+    '''
+    if isinstance(paths, str):
+        paths = sorted(glob(paths))
+    else:
+        paths = list(paths)
+
+    if len(paths) == 0:
+        raise ValueError('No input files given')
+
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+
+    t0 = time.perf_counter()
+    args = (key, columns, parse_dates, where, categorical)
+    if n_jobs == 1 or len(paths) == 1:
+        results = [read_h5py_file_arrays(p, *args) for p in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(paths))) as pool:
+            results = list(pool.map(
+                read_h5py_file_arrays, paths, *[repeat(a) for a in args]
+            ))
+
+    n_bytes_total = 0
+    for file_path, (arrays, n_bytes, duration) in zip(paths, results):
+        n_rows = len(next(iter(arrays.values()))) if len(arrays) > 0 else 0
+        n_bytes_total += n_bytes
+        log.info('Read {} rows ({:.1f} MB) from {} in {:.2f} s ({:.1f} MB/s)'.format(
+            n_rows, n_bytes / 1e6, file_path, duration,
+            n_bytes / 1e6 / duration if duration > 0 else float('inf'),
+        ))
+
+    names = list(results[0][0].keys())
+    for file_path, (arrays, _, _) in zip(paths, results):
+        if list(arrays.keys()) != names:
+            raise ValueError('File {} has different columns than {}'.format(
+                file_path, paths[0]
+            ))
+
+    lengths = np.array([
+        len(arrays[names[0]]) if len(names) > 0 else 0
+        for arrays, _, _ in results
+    ])
+    n_rows = lengths.sum()
+
+    data = {}
+    for name in names:
+        parts = [arrays[name] for arrays, _, _ in results]
+
+        if any(isinstance(part, pd.Categorical) for part in parts):
+            data[name] = union_categoricals([pd.Categorical(part) for part in parts])
+        else:
+            dtype = np.result_type(*parts)
+            out = np.empty((n_rows, ) + parts[0].shape[1:], dtype=dtype)
+            offset = 0
+            for part in parts:
+                out[offset:offset + len(part)] = part
+                offset += len(part)
+            data[name] = out
+
+        # free memory of the per file arrays as soon as possible
+        for arrays, _, _ in results:
+            del arrays[name]
+
+    df = arrays_to_dataframe(data)
+
+    if file_column is not None:
+        df[file_column] = pd.Categorical.from_codes(
+            np.repeat(np.arange(len(paths)), lengths), categories=paths,
+        )
+
+    duration = time.perf_counter() - t0
+    log.info('Read {} rows ({:.1f} MB) from {} files in {:.2f} s'.format(
+        n_rows, n_bytes_total / 1e6, len(paths), duration,
+    ))
+
+    return df
+
+
+def read_h5py_file_arrays(
+        file_path,
+        key='data',
+        columns=None,
+        parse_dates=True,
+        where=None,
+        categorical=False):
+    '''
+    Read datasets of one file for `read_h5py_many`.
+    Returns the arrays, the number of bytes of the
+    datasets read in the file and the time it took.
+    '''
+    t0 = time.perf_counter()
+    with h5py.File(file_path, 'r') as f:
+        group = get_h5py_group(f, key)
+
+        rows = None
+        if where is not None:
+            rows = select_h5py_rows(group, where)
+
+        arrays = read_h5py_group_arrays(
+            group,
+            columns=columns,
+            parse_dates=parse_dates,
+            rows=rows,
+            categorical=categorical,
+        )
+        n_bytes = sum(group[col].id.get_storage_size() for col in arrays)
+
+    return arrays, n_bytes, time.perf_counter() - t0
+
+
+_hdf5_format_cache = {}
+
+
+def sniff_hdf5_format(file_path):
+    '''
+    Determine if an hdf5 file was written by pandas (`pd.to_hdf` / `HDFStore`)
+    or is an h5py style file with one dataset per column.
+    Returns either `'pandas'` or `'h5py'`.
+
+    Pandas files contain at least one group with the `pandas_type` attribute.
+    The result is cached per path, as long as the modification time
+    and size of the file do not change.
+    '''
+    stat = os.stat(file_path)
+    cache_key = path.abspath(file_path)
+    cached = _hdf5_format_cache.get(cache_key)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+
+    with h5py.File(file_path, 'r') as f:
+        file_format = 'pandas' if has_pandas_group(f) else 'h5py'
+
+    _hdf5_format_cache[cache_key] = (stat.st_mtime_ns, stat.st_size, file_format)
+    return file_format
+
+
+def has_pandas_group(group):
+    '''
+    Recursively look for a group with the `pandas_type` attribute,
+    only groups are opened, not the datasets.
+    '''
+    if 'pandas_type' in group.attrs:
+        return True
+
+    for name in group:
+        if group.get(name, getclass=True) is h5py.Group:
+            if has_pandas_group(group[name]):
+                return True
+
+    return False
+
+
+def read_data(file_path, key=None, columns=None, **kwargs):
+    '''
+    This is a utility wrapper for other reading functions.
+    It will look for the file extension and try to use the correct
+    reader and return a dataframe.
+
+    Currently supported are hdf5 (pandas and h5py), json, jsonlines, csv,
+    parquet and arrow ipc (feather v2)
+
+    Parameters
+    ----------
+    file_path: str
+        Path to the input file
+
+    For hdf5 files, `sniff_hdf5_format` determines which reader is used.
+    All kwargs are passed to the individual reading function:
+
+    pandas hdf5:   pd.read_hdf
+    h5py hdf5:     fact.io.read_h5py
+    json:          pd.DataFrame(json.load(file))
+    jsonlines:     pd.read_json
+    csv:           pd.read_csv
+    parquet:       fact.io.read_parquet
+    arrow/feather: fact.io.read_arrow
+    '''
+    name, extension = path.splitext(file_path)
+
+    if extension in ['.hdf', '.hdf5', '.h5']:
+        if sniff_hdf5_format(file_path) == 'pandas':
+            return pd.read_hdf(file_path, key=key, columns=columns, **kwargs)
+
+        if key is not None:
+            kwargs['key'] = key
+        return read_h5py(file_path, columns=columns, **kwargs)
+
+    if extension == '.parquet':
+        return read_parquet(file_path, columns=columns, **kwargs)
+
+    if extension in ('.arrow', '.feather'):
+        return read_arrow(file_path, columns=columns, **kwargs)
+
+    if extension == '.json':
+        with open(file_path, 'r') as j:
+            d = json.load(j)
+            df = pd.DataFrame(d)
+
+    elif extension in ('.jsonl', '.jsonlines'):
+        df = pd.read_json(file_path, lines=True, **kwargs)
+
+    elif extension == '.csv':
+        df = pd.read_csv(file_path, **kwargs)
+
+    else:
+        raise NotImplementedError('Unknown data file extension {}'.format(extension))
+
+    if columns:
+        df = df[columns]
+
+    return df
+
+
+def read_data_chunked(file_path, key='data', columns=None, chunksize=None, **kwargs):
+    '''
+    Generator function to read data in chunks, the chunked counterpart
+    of `read_data`. Yields tuples `(df, start, end)` like `read_h5py_chunked`,
+    the index of each chunk runs from `start` to `end`.
+
+    When chunksize is None, use 1 chunk
+
+    Column selection is done while parsing, so only the requested columns
+    are kept in memory:
+
+    For hdf5 files, `sniff_hdf5_format` determines which reader is used.
+
+    pandas hdf5:   pd.read_hdf with `chunksize`, this needs files
+                   written with `format='table'`
+    h5py hdf5:     fact.io.read_h5py_chunked
+    csv:           pd.read_csv with `usecols` and `chunksize`
+    jsonlines:     the lines are parsed in batches of `chunksize`,
+                   keys not in `columns` are dropped per batch
+    json:          the file has to be loaded completely by `json.load`,
+                   unused keys are dropped before building the DataFrame
+
+    Parameters
+    ----------
+    file_path: str
+        Path to the input file
+    key: str
+        Groupkey, only used for hdf5
+    columns: iterable[str]
+        Names of the columns to read
+    chunksize: int
+        Number of rows per chunk
+
+    All other kwargs are passed to the individual reading function.
+    '''
+    name, extension = path.splitext(file_path)
+
+    if extension in ['.hdf', '.hdf5', '.h5']:
+        if sniff_hdf5_format(file_path) != 'pandas':
+            yield from read_h5py_chunked(
+                file_path, key=key, columns=columns, chunksize=chunksize, **kwargs
+            )
+            return
+
+        chunks = read_pandas_hdf5_chunks(file_path, key, columns, chunksize, **kwargs)
+
+    elif extension == '.csv':
+        chunks = read_csv_chunks(file_path, columns, chunksize, **kwargs)
+
+    elif extension in ('.jsonl', '.jsonlines'):
+        chunks = read_jsonl_chunks(file_path, columns, chunksize)
+
+    elif extension == '.json':
+        chunks = read_json_chunks(file_path, columns, chunksize)
+
+    else:
+        raise NotImplementedError(
+            'Chunked reading not supported for file extension {}'.format(extension)
+        )
+
+    start = 0
+    for df in chunks:
+        end = start + len(df)
+        df.index = np.arange(start, end)
+        yield df, start, end
+        start = end
+
+
+def read_pandas_hdf5_chunks(file_path, key='data', columns=None, chunksize=None, **kwargs):
+    ''' Iterate over chunks of a pandas hdf5 file, only reading `columns` '''
+    if chunksize is None:
+        yield pd.read_hdf(file_path, key=key, columns=columns, **kwargs)
+        return
+
+    yield from pd.read_hdf(file_path, key=key, columns=columns, chunksize=chunksize, **kwargs)
+
+
+def read_csv_chunks(file_path, columns=None, chunksize=None, **kwargs):
+    ''' Iterate over chunks of a csv file, only parsing `columns` '''
+    usecols = list(columns) if columns is not None else None
+    if chunksize is None:
+        reader = [pd.read_csv(file_path, usecols=usecols, **kwargs)]
+    else:
+        reader = pd.read_csv(file_path, usecols=usecols, chunksize=chunksize, **kwargs)
+
+    for df in reader:
+        # usecols does not preserve the requested column order
+        yield df if usecols is None else df[usecols]
+
+
+def read_jsonl_chunks(file_path, columns=None, chunksize=None):
+    ''' Iterate over chunks of a jsonlines file, only keeping `columns` '''
+    with open(file_path, 'r') as f:
+        records = []
+        for line in f:
+            if not line.strip():
+                continue
+
+            records.append(json.loads(line))
+            if chunksize is not None and len(records) == chunksize:
+                yield pd.DataFrame.from_records(records, columns=columns)
+                records = []
+
+        if records or chunksize is None:
+            yield pd.DataFrame.from_records(records, columns=columns)
+
+
+def read_json_chunks(file_path, columns=None, chunksize=None):
+    ''' Iterate over chunks of a json file, only keeping `columns` '''
+    with open(file_path, 'r') as f:
+        d = json.load(f)
+
+    if isinstance(d, dict):
+        if columns is not None:
+            d = {col: d[col] for col in columns}
+        df = pd.DataFrame(d)
+    else:
+        df = pd.DataFrame.from_records(d, columns=columns)
+    del d
+
+    if chunksize is None:
+        yield df
+        return
+
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize].copy()
+
+
+def check_extension(file_path, allowed_extensions=allowed_extensions):
+    p, extension = path.splitext(file_path)
+    if extension not in allowed_extensions:
+        raise IOError('Allowed formats: {}'.format(allowed_extensions))
+
+
+def import_pyarrow():
+    ''' Import pyarrow, which is only needed for parquet and arrow files '''
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(
+            'pyarrow is needed to read and write parquet and arrow files'
+        ) from None
+    return pyarrow
+
+
+def dataframe_to_arrow_table(df, index=True, dtypes=None):
+    '''
+    Convert a DataFrame into a `pyarrow.Table`, following the conventions
+    of `to_h5py`: the index is stored as column `index`,
+    columns of lists are stored as fixed size lists (the 2d columns of h5py)
+    and categoricals are dictionary encoded.
+    '''
+    pa = import_pyarrow()
+
+    names = []
+    columns = []
+    arrays = dataframe_to_arrays(df, index=index, dtypes=dtypes, keep_categoricals=True)
+    for name, array in arrays.items():
+        if isinstance(array, pd.Categorical):
+            column = pa.DictionaryArray.from_pandas(array)
+        else:
+            array = prepare_arrow_data(array)
+            if array.ndim == 2:
+                column = pa.FixedSizeListArray.from_arrays(
+                    pa.array(array.ravel()), array.shape[1]
+                )
+            else:
+                column = pa.array(array)
+        names.append(name)
+        columns.append(column)
+
+    return pa.Table.from_arrays(columns, names=names)
+
+
+def prepare_arrow_data(array):
+    ''' Convert `array` into a representation pyarrow can store '''
+    if array.dtype.byteorder not in ('=', native_byteorder, '|'):
+        array = array.astype(array.dtype.newbyteorder('='))
+
+    if array.dtype.base == object and len(array) > 0 and isinstance(array[0], list):
+        array = np.array([o for o in array])
+
+    return array
+
+
+def arrow_table_to_arrays(table):
+    '''
+    Convert a `pyarrow.Table` into a dict of numpy arrays
+    in the same format as `read_h5py_arrays`.
+    '''
+    pa = import_pyarrow()
+
+    arrays = {}
+    for name, column in zip(table.column_names, table.columns):
+        if pa.types.is_fixed_size_list(column.type):
+            n = column.type.list_size
+            if column.num_chunks == 0:
+                values = np.empty(0, dtype=column.type.value_type.to_pandas_dtype())
+            else:
+                values = column.combine_chunks().flatten().to_numpy(zero_copy_only=False)
+            arrays[name] = values.reshape(-1, n)
+        else:
+            arrays[name] = column.to_pandas().values
 
-        n_rows = h5py_get_n_rows(file_path, key=key)
+    return arrays
 
-        if chunksize is None:
-            n_chunks = 1
-            chunksize = n_rows
-        else:
-            n_chunks = int(np.ceil(n_rows / chunksize))
-            log.info('Splitting data into {} chunks'.format(n_chunks))
 
-        for col in copy(columns):
-            if group[col].ndim > 2:
-                columns.remove(col)
-                log.warning('Ignoring column {}, not 1d or 2d'.format(col))
+def to_parquet(df, file_path, index=True, dtypes=None, row_group_size=100000, compression='zstd', **kwargs):
+    '''
+    Write a DataFrame to a parquet file.
+    The dataframe is converted and written in row groups of `row_group_size`
+    rows, so only one row group at a time has to be converted to arrow.
 
-    for chunk in range(n_chunks):
+    Parameters
+    ----------
+    df: pd.DataFrame
+        DataFrame to save
+    file_path: str
+        Path to the outputfile
+    index: bool
+        If True, the index is stored as column `index`
+    dtypes: dict
+        if given, a mapping of column names to dtypes for conversion
+    row_group_size: int
+        Number of rows per row group
+    compression: str
+        Compression codec for the parquet file
 
-        start = chunk * chunksize
-        end = min(n_rows, (chunk + 1) * chunksize)
+    All other key word arguments are passed to `pyarrow.parquet.ParquetWriter`.
+    '''
+    import_pyarrow()
+    import pyarrow.parquet as pq
 
-        df = read_h5py(
-            file_path,
-            key=key,
-            columns=columns,
-            parse_dates=parse_dates,
-            first=start,
-            last=end
-        )
-        df.index = np.arange(start, end)
+    writer = None
+    try:
+        for start in range(0, max(len(df), 1), row_group_size):
+            table = dataframe_to_arrow_table(
+                df.iloc[start:start + row_group_size], index=index, dtypes=dtypes,
+            )
+            if writer is None:
+                writer = pq.ParquetWriter(
+                    file_path, table.schema, compression=compression, **kwargs
+                )
+            writer.write_table(table, row_group_size=row_group_size)
+    finally:
+        if writer is not None:
+            writer.close()
 
-        yield df, start, end
 
+def to_arrow(df, file_path, index=True, dtypes=None, row_group_size=100000, compression='lz4', **kwargs):
+    '''
+    Write a DataFrame to an arrow ipc (feather v2) file.
+    The dataframe is converted and written in record batches of `row_group_size`
+    rows, so only one batch at a time has to be converted to arrow.
 
-def read_data(file_path, key=None, columns=None, **kwargs):
+    Parameters
+    ----------
+    df: pd.DataFrame
+        DataFrame to save
+    file_path: str
+        Path to the outputfile
+    index: bool
+        If True, the index is stored as column `index`
+    dtypes: dict
+        if given, a mapping of column names to dtypes for conversion
+    row_group_size: int
+        Number of rows per record batch
+    compression: str
+        Compression codec for the record batches, `lz4`, `zstd` or None
+
+    All other key word arguments are passed to `pyarrow.ipc.IpcWriteOptions`.
     '''
-    This is a utility wrapper for other reading functions.
-    It will look for the file extension and try to use the correct
-    reader and return a dataframe.
+    pa = import_pyarrow()
+
+    options = pa.ipc.IpcWriteOptions(compression=compression, **kwargs)
+    writer = None
+    try:
+        for start in range(0, max(len(df), 1), row_group_size):
+            table = dataframe_to_arrow_table(
+                df.iloc[start:start + row_group_size], index=index, dtypes=dtypes,
+            )
+            if writer is None:
+                writer = pa.ipc.new_file(file_path, table.schema, options=options)
+            writer.write_table(table, max_chunksize=row_group_size)
+    finally:
+        if writer is not None:
+            writer.close()
+
 
-    Currently supported are hdf5 (pandas and h5py), json, jsonlines and csv
+def read_arrow_dataset(file_path, file_format, columns=None, filters=None):
+    '''
+    Read a parquet or arrow file into a dict of arrays as returned by
+    `read_h5py_arrays`.
 
     Parameters
     ----------
     file_path: str
         Path to the input file
-
-    All kwargs are passed to the individual reading function:
-
-    pandas hdf5:   pd.read_hdf
-    h5py hdf5:     fact.io.read_h5py
-    json:          pd.DataFrame(json.load(file))
-    jsonlines:     pd.read_json
-    csv:           pd.read_csv
+    file_format: str
+        `parquet` or `ipc`
+    columns: iterable[str]
+        Names of the columns to read, as stored in the file,
+        2d columns are read completely
+    filters: list or pyarrow.compute.Expression
+        Row filter, either a pyarrow expression or filters in the
+        disjunctive normal form accepted by `pyarrow.parquet.read_table`,
+        e.g. `[('gamma_prediction', '>', 0.8)]`.
+        For parquet files, row groups are skipped using their statistics.
     '''
-    name, extension = path.splitext(file_path)
+    import_pyarrow()
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
 
-    if extension in ['.hdf', '.hdf5', '.h5']:
-        try:
-            df = pd.read_hdf(file_path, key=key, columns=columns, **kwargs)
-        except (TypeError, ValueError):
-            df = read_h5py(file_path, key=key, columns=columns, **kwargs)
-        return df
+    if filters is not None and not isinstance(filters, ds.Expression):
+        filters = pq.filters_to_expression(filters)
 
-    if extension == '.json':
-        with open(file_path, 'r') as j:
-            d = json.load(j)
-            df = pd.DataFrame(d)
+    dataset = ds.dataset(file_path, format=file_format)
+    if columns is not None:
+        columns = list(columns)
+        if 'index' in dataset.schema.names and 'index' not in columns:
+            columns.append('index')
 
-    elif extension in ('.jsonl', '.jsonlines'):
-        df = pd.read_json(file_path, lines=True, **kwargs)
+    table = dataset.to_table(columns=columns, filter=filters)
+    return arrow_table_to_arrays(table)
 
-    elif extension == '.csv':
-        df = pd.read_csv(file_path, **kwargs)
 
-    else:
-        raise NotImplementedError('Unknown data file extension {}'.format(extension))
+def read_parquet(file_path, columns=None, filters=None):
+    '''
+    Read a parquet file written by `to_parquet` into a DataFrame.
+    2d columns are split into one column per entry, like in `read_h5py`.
 
-    if columns:
-        df = df[columns]
+    Parameters
+    ----------
+    file_path: str
+        Path to the input file
+    columns: iterable[str]
+        Names of the columns to read, only these columns are loaded
+    filters: list or pyarrow.compute.Expression
+        Row filter, see `read_arrow_dataset`
+    '''
+    arrays = read_arrow_dataset(file_path, 'parquet', columns=columns, filters=filters)
+    return arrays_to_dataframe(arrays)
 
-    return df
 
+def read_arrow(file_path, columns=None, filters=None):
+    '''
+    Read an arrow ipc (feather v2) file written by `to_arrow` into a DataFrame.
+    2d columns are split into one column per entry, like in `read_h5py`.
 
-def check_extension(file_path, allowed_extensions=allowed_extensions):
-    p, extension = path.splitext(file_path)
-    if extension not in allowed_extensions:
-        raise IOError('Allowed formats: {}'.format(allowed_extensions))
+    Parameters
+    ----------
+    file_path: str
+        Path to the input file
+    columns: iterable[str]
+        Names of the columns to read, only these columns are loaded
+    filters: list or pyarrow.compute.Expression
+        Row filter, see `read_arrow_dataset`
+    '''
+    arrays = read_arrow_dataset(file_path, 'ipc', columns=columns, filters=filters)
+    return arrays_to_dataframe(arrays)
 
 
-def to_h5py(df, filename, key='data', mode='a', dtypes=None, index=True, **kwargs):
+def to_h5py(
+        df,
+        filename,
+        key='data',
+        mode='a',
+        dtypes=None,
+        index=True,
+        profile=None,
+        contiguous=False,
+        timeformat='iso',
+        encode_categoricals=False,
+        n_threads=1,
+        **kwargs):
     '''
     Write pandas dataframe to h5py style hdf5 file
 
@@ -340,21 +1881,59 @@ def to_h5py(df, filename, key='data', mode='a', dtypes=None, index=True, **kwarg
         if given, a mapping of column names to dtypes for conversion.
     index: bool
         If bool, also save the index of the dataframe
+    profile: str or None
+        Name of one of the `H5PY_PROFILES` to choose
+        chunk size and compression, see `create_empty_h5py_dataset`
+    contiguous: bool
+        If True, write uncompressed datasets with contiguous storage,
+        which can be memory mapped by `read_h5py(..., memmap=True)`.
+        Useful for scratch files, these datasets cannot be appended to.
+    timeformat: str
+        How to store datetime columns, either 'iso' for ISO 8601 strings
+        or 'unix' for int64 values since the unix epoch, which are much
+        faster to read. Only used when creating new datasets.
+    encode_categoricals: bool
+        If True, categorical columns are stored as int32 codes with the
+        categories in the `categories` attribute of the dataset.
+        `read_h5py` returns these columns as `pd.Categorical`.
+        Only used when creating new datasets, appending to
+        such datasets always encodes the values.
+    n_threads: int or None
+        If not 1, compress the chunks in a pool of this many threads
+        and write them using `write_direct_chunk`, None uses all cpus.
+        The resulting file is identical to one written by hdf5 itself.
+        Supported are gzip and blosc (requires the `blosc` module)
+        compressed datasets with fixed size types,
+        all other datasets are written normally.
 
     All `**kwargs` are passed to h5py.create_dataset
     '''
     assert mode in ('w', 'a'), 'mode has to be either "a" or "w"'
 
-    array = df.to_records(index=index)
-
-    if dtypes is not None:
-        array = change_recarray_dtype(array, dtypes)
+    # write column by column directly from the dataframe,
+    # avoiding the row-major copy of df.to_records
+    arrays = dataframe_to_arrays(
+        df, index=index, dtypes=dtypes, keep_categoricals=encode_categoricals,
+    )
 
     with h5py.File(filename, mode=mode) as f:
+        if contiguous:
+            if key in f:
+                raise ValueError('Cannot append to contiguous datasets, group {} exists'.format(key))
+
+            group = f.create_group(key)
+            for name, array in arrays.items():
+                create_contiguous_h5py_dataset(array, group, name, timeformat=timeformat)
+            return
+
         if key not in f:
-            initialize_h5py(f, array, key=key, **kwargs)
+            initialize_h5py(
+                f, arrays, key=key,
+                profile=profile, expected_rows=len(df), timeformat=timeformat,
+                **kwargs
+            )
 
-        append_to_h5py(f, array, key=key)
+        append_to_h5py(f, arrays, key=key, n_threads=n_threads)
 
 
 def change_recarray_dtype(array, dtypes):
@@ -396,7 +1975,7 @@ def initialize_h5py(f, array, key='events', **kwargs):
     ----------
     f: h5py.File
         the hdf5 file, opened either in write or append mode
-    array: numpy structured array
+    array: numpy structured array or dict of numpy arrays
         The data
     key: str
         the name for the hdf5 group to hold all datasets, default: data
@@ -405,8 +1984,7 @@ def initialize_h5py(f, array, key='events', **kwargs):
     '''
     group = f.require_group(key)
 
-    dtypes = array.dtype
-    for name in dtypes.names:
+    for name in column_names(array):
         create_empty_h5py_dataset(
             array[name],
             group,
@@ -417,11 +1995,19 @@ def initialize_h5py(f, array, key='events', **kwargs):
     return group
 
 
-def create_empty_h5py_dataset(array, group, name, **kwargs):
+def create_empty_h5py_dataset(
+        array,
+        group,
+        name,
+        profile=None,
+        expected_rows=None,
+        timeformat='iso',
+        **kwargs):
     '''
     Create a new h5py dataset for the content of `array`.
 
-    datetime64 objects are stored as fixed length strings
+    datetime64 objects are stored as fixed length strings or
+    int64 values since the unix epoch, depending on `timeformat`
     arrays of lists are stored as 2d arrays (so they have to be fixed length)
     strings are stored as special dtype for strings
 
@@ -433,49 +2019,181 @@ def create_empty_h5py_dataset(array, group, name, **kwargs):
         the hdf5 group the dataset should be created in
     name: str
         name for the new dataset
+    profile: str or None
+        Name of one of the `H5PY_PROFILES`, used to choose
+        chunk size and compression if not given in `kwargs`.
+        If None, chunks are planned for the 'balanced' profile and
+        the result of `get_default_compression` is used.
+    expected_rows: int or None
+        Expected number of rows of the dataset, used to
+        avoid chunks much larger than the whole dataset
+    timeformat: str
+        How to store datetimes, see `h5py_storage_type`
     **kwargs:
         all **kwargs are passed to create_dataset, useful for e.g. compression
     '''
+    dt, row_shape, attrs = h5py_storage_type(array, timeformat=timeformat)
+    maxshape = [None] + row_shape
+    shape = [0] + row_shape
+
+    if profile is not None and profile not in H5PY_PROFILES:
+        raise ValueError('Unknown profile "{}", available: {}'.format(
+            profile, list(H5PY_PROFILES)
+        ))
+    settings = H5PY_PROFILES[profile or 'balanced']
+
+    if 'chunks' not in kwargs:
+        kwargs['chunks'] = plan_h5py_chunks(
+            np.dtype(dt), shape,
+            expected_rows=expected_rows,
+            chunk_bytes=settings['chunk_bytes'],
+        )
+
+    # add default compression options if no options are given
+    if 'compression' not in kwargs:
+        default_compression = get_default_compression()
+        if profile is not None and default_compression.get('compression') == BLOSC_FILTER_ID:
+            kwargs.update(create_blosc_compression_options(**settings['compression']))
+        else:
+            kwargs.update(default_compression)
+
+    dataset = group.create_dataset(
+        name,
+        shape=tuple(shape),
+        maxshape=tuple(maxshape),
+        dtype=dt,
+        **kwargs
+    )
+
+    for k, v in attrs.items():
+        dataset.attrs[k] = v
+
+    return dataset
+
+
+def create_contiguous_h5py_dataset(array, group, name, timeformat='iso'):
+    '''
+    Create a new h5py dataset containing `array` using contiguous,
+    uncompressed storage. Such datasets cannot be resized, but they can
+    be memory mapped, see `read_h5py`.
+
+    Parameters
+    ----------
+    array: numpy.array
+        the data
+    group: h5py.Group
+        the hdf5 group the dataset should be created in
+    name: str
+        name for the new dataset
+    timeformat: str
+        How to store datetimes, see `h5py_storage_type`
+    '''
+    dt, row_shape, attrs = h5py_storage_type(array, timeformat=timeformat)
+
+    dataset = group.create_dataset(name, shape=tuple([len(array)] + row_shape), dtype=dt)
+    if len(array) > 0:
+        dataset[:] = prepare_h5py_data(array, attrs)
+
+    for k, v in attrs.items():
+        dataset.attrs[k] = v
+
+    return dataset
+
+
+def h5py_storage_type(array, timeformat='iso'):
+    '''
+    Determine how `array` is stored in an hdf5 dataset.
+
+    Parameters
+    ----------
+    array: numpy.array
+        the data
+    timeformat: str
+        How to store datetime64 data, either 'iso' for fixed length
+        ISO 8601 strings or 'unix' for int64 values since the unix epoch
+        in the unit of the array, which is stored in the `unit` attribute.
+
+    Returns
+    -------
+    dtype: np.dtype
+        dtype of the dataset
+    row_shape: list[int]
+        shape of one row of the dataset
+    attrs: dict
+        attributes to set on the dataset
+    '''
+    if isinstance(array, pd.Categorical):
+        # store integer codes, the categories are stored as attribute
+        return np.dtype('int32'), [], {'categories': h5py_categories(array.categories)}
+
     dtype = array.dtype
-    maxshape = [None] + list(array.shape)[1:]
-    shape = [0] + list(array.shape)[1:]
+    row_shape = list(array.shape)[1:]
     attrs = {}
 
     if dtype.base == object:
         if isinstance(array[0], list):
             dt = np.array(array[0]).dtype
-            shape = [0, len(array[0])]
-            maxshape = [None, len(array[0])]
+            row_shape = [len(array[0])]
         else:
             dt = h5py.special_dtype(vlen=str)
 
     elif dtype.type == np.datetime64:
-        # save dates as ISO string, create dummy date to get correct length
-        dt = np.array(0, dtype=dtype).astype('S').dtype
-        attrs['timeformat'] = 'iso'
+        if timeformat == 'iso':
+            # save dates as ISO string, create dummy date to get correct length
+            dt = np.array(0, dtype=dtype).astype('S').dtype
+        elif timeformat == 'unix':
+            dt = np.dtype('int64')
+            attrs['unit'] = np.datetime_data(dtype)[0]
+        else:
+            raise ValueError('Unknown timeformat "{}"'.format(timeformat))
+        attrs['timeformat'] = timeformat
 
     else:
         dt = dtype.base
 
-    # add default compression options if no options are given
-    if 'compression' not in kwargs:
-        kwargs.update(DEFAULT_COMPRESSION)
+    return dt, row_shape, attrs
 
-    dataset = group.create_dataset(
-        name,
-        shape=tuple(shape),
-        maxshape=tuple(maxshape),
-        dtype=dt,
-        **kwargs
-    )
 
-    for k, v in attrs.items():
-        dataset.attrs[k] = v
+def plan_h5py_chunks(dtype, shape, expected_rows=None, chunk_bytes=2**20, min_rows=1024):
+    '''
+    Choose the chunk shape for a resizable dataset, so that one chunk
+    has about `chunk_bytes` bytes. Chunks are only split along the first axis.
+    The number of rows per chunk is a power of two, so the chunks of all
+    columns in a group end on the boundaries of the largest chunks.
 
-    return dataset
+    Parameters
+    ----------
+    dtype: np.dtype
+        The dtype of the dataset
+    shape: tuple[int]
+        The shape of the dataset, only `shape[1:]` is used
+    expected_rows: int or None
+        If given, chunks are not made larger than this number of rows
+        rounded up to a power of two, unless it is smaller than `min_rows`
+    chunk_bytes: int
+        Targeted maximum size of one uncompressed chunk
+    min_rows: int
+        Lower bound for the number of rows in one chunk
+        applied to `expected_rows`, should be a power of two
+
+    Returns
+    -------
+    chunks: tuple[int]
+    '''
+    row_shape = tuple(shape[1:])
+    row_bytes = max(np.dtype(dtype).itemsize * int(np.prod(row_shape)), 1)
+
+    # largest power of two with at most chunk_bytes
+    chunk_rows = 2**(max(chunk_bytes // row_bytes, 1).bit_length() - 1)
+    if expected_rows is not None:
+        # smallest power of two with at least expected_rows
+        max_rows = 2**(max(int(expected_rows), 1) - 1).bit_length()
+        chunk_rows = min(chunk_rows, max(max_rows, min_rows))
+
+    return (int(chunk_rows), ) + row_shape
 
 
-def append_to_h5py_dataset(array, dataset):
+def append_to_h5py_dataset(array, dataset, n_threads=1):
     '''
     Append a single numpy array to an h5py dataset.
 
@@ -488,11 +2206,113 @@ def append_to_h5py_dataset(array, dataset):
         the numpy array to append
     dataset: h5py.Dataset
         the hdf5 dataset to append to
+    n_threads: int or None
+        If not 1, compress chunks in a pool of this many threads,
+        see `write_h5py_dataset_threaded`
     '''
     n_existing_rows = dataset.shape[0]
     n_new_rows = array.shape[0]
 
     dataset.resize(n_existing_rows + n_new_rows, axis=0)
+    write_h5py_rows(
+        dataset, prepare_h5py_data(array, dataset.attrs), n_existing_rows, n_threads=n_threads,
+    )
+
+
+def write_h5py_rows(dataset, data, start, n_threads=1):
+    '''
+    Write `data` into the rows of `dataset` starting at `start`.
+    If `n_threads` is not 1 and the dataset is supported by
+    `write_h5py_dataset_threaded`, chunks are compressed in parallel.
+    '''
+    if n_threads != 1:
+        if write_h5py_dataset_threaded(dataset, data, start, n_threads=n_threads):
+            return
+
+    dataset[start:start + len(data)] = data
+
+
+def write_h5py_dataset_threaded(dataset, data, start, n_threads=None):
+    '''
+    Write `data` into the rows of `dataset` starting at `start`,
+    compressing the chunks in a thread pool and writing them using
+    `write_direct_chunk`. The chunks are encoded exactly like the
+    hdf5 filter pipeline of the dataset would do it, so the file can be
+    read by any hdf5 reader.
+
+    Chunks only partly covered by `data` are read, decoded and updated.
+    Only datasets supported by both `h5py_chunk_encoder` and
+    `h5py_chunk_decoder`, chunked only along the first axis
+    and with fixed size types can be written this way.
+    It also needs hdf5 >= 1.10.5.
+
+    Returns
+    -------
+    written: bool
+        False if the dataset is not supported and nothing was written.
+    '''
+    if dataset.chunks is None or dataset.dtype.kind == 'O':
+        return False
+
+    if tuple(dataset.chunks[1:]) != tuple(dataset.shape[1:]):
+        return False
+
+    if not h5py_direct_chunk_supported(dataset):
+        return False
+
+    encode = h5py_chunk_encoder(dataset)
+    decode = h5py_chunk_decoder(dataset)
+    if encode is None or decode is None:
+        return False
+
+    if n_threads is None or n_threads == -1:
+        n_threads = os.cpu_count()
+
+    data = np.ascontiguousarray(data, dtype=dataset.dtype)
+    stop = start + len(data)
+    if stop > dataset.shape[0]:
+        raise ValueError('Dataset too small, resize before writing')
+
+    chunk_shape = dataset.chunks
+    chunk_rows = chunk_shape[0]
+    zeros = (0, ) * (dataset.ndim - 1)
+
+    def write_chunk(chunk_start):
+        lo = max(start, chunk_start)
+        hi = min(stop, chunk_start + chunk_rows)
+        offset = (chunk_start, ) + zeros
+
+        if hi - lo == chunk_rows:
+            chunk = data[lo - start:hi - start]
+        else:
+            raw_chunk = read_h5py_raw_chunk(dataset, offset)
+            if raw_chunk is None:
+                chunk = np.full(chunk_shape, dataset.fillvalue, dtype=dataset.dtype)
+            else:
+                filter_mask, raw = raw_chunk
+                chunk = np.frombuffer(decode(raw, filter_mask), dtype=dataset.dtype)
+                chunk = chunk.reshape(chunk_shape).copy()
+            chunk[lo - chunk_start:hi - chunk_start] = data[lo - start:hi - start]
+
+        dataset.id.write_direct_chunk(offset, encode(chunk.tobytes()))
+
+    chunk_starts = range(start // chunk_rows * chunk_rows, stop, chunk_rows)
+    with ThreadPoolExecutor(max_workers=n_threads) as pool:
+        # list to raise possible exceptions
+        list(pool.map(write_chunk, chunk_starts))
+
+    return True
+
+
+def prepare_h5py_data(array, attrs=None):
+    '''
+    Convert `array` into the representation stored in the hdf5 file
+    by `create_empty_h5py_dataset`. `attrs` are the attributes of the
+    target dataset, used to determine the format of datetimes
+    and the categories of dictionary encoded columns.
+    '''
+    if attrs is not None and 'categories' in attrs:
+        return encode_categories(array, attrs)
 
     # swap byteorder if not native
     if array.dtype.byteorder not in ('=', native_byteorder, '|'):
@@ -501,16 +2321,44 @@ def append_to_h5py_dataset(array, dataset):
         data = array
 
     if data.dtype.type == np.datetime64:
-        data = data.astype('S')
+        if attrs is not None and attrs.get('timeformat') == 'unix':
+            data = data.astype('datetime64[{}]'.format(attrs['unit'])).view('int64')
+        else:
+            data = data.astype('S')
 
     if data.dtype.base == object:
         if isinstance(data[0], list):
             data = np.array([o for o in data])
 
-    dataset[n_existing_rows:] = data
+    return data
+
 
+def h5py_categories(categories):
+    ''' Convert the categories of a `pd.Categorical` into an hdf5 attribute '''
+    categories = np.asarray(categories)
+    if categories.dtype.kind in {'O', 'U'}:
+        return np.array(categories, dtype=h5py.special_dtype(vlen=str))
+    return categories
 
-def append_to_h5py(f, array, key='events'):
+
+def encode_categories(array, attrs):
+    '''
+    Convert `array` to integer codes of the categories stored in `attrs`.
+    Values not yet in the categories are added to `attrs['categories']`.
+    Missing values are encoded as -1.
+    '''
+    categories = list(decode_h5py_strings(attrs['categories']))
+
+    known = set(categories)
+    new = [c for c in pd.Categorical(array).categories if c not in known]
+    if len(new) > 0:
+        categories.extend(new)
+        attrs['categories'] = h5py_categories(categories)
+
+    return pd.Categorical(array, categories=categories).codes.astype('int32')
+
+
+def append_to_h5py(f, array, key='events', n_threads=1):
     '''
     Append a numpy record or structured array to the given hdf5 file
     The file should have been previously initialized with initialize_hdf5
@@ -519,19 +2367,249 @@ def append_to_h5py(f, array, key='events'):
     ----------
     f: h5py.File
         the hdf5 file, opened either in write or append mode
-    array: numpy.array or numpy.recarray
-        the numpy array to append
+    array: numpy.recarray or dict of numpy arrays
+        the data to append
     key: str
         the name for the hdf5 group with the corresponding data sets
+    n_threads: int or None
+        Number of threads used to compress chunks, see `append_to_h5py_dataset`
     '''
 
     group = f.get(key)
 
-    for column in array.dtype.names:
+    for column in column_names(array):
         dataset = group.get(column)
         if dataset is None:
             raise KeyError('No such dataset {}'.format(column))
-        append_to_h5py_dataset(array[column], dataset)
+        append_to_h5py_dataset(array[column], dataset, n_threads=n_threads)
+
+
+def column_names(array):
+    ''' Names of the columns of a structured array or a dict of arrays '''
+    if isinstance(array, dict):
+        return list(array.keys())
+    return array.dtype.names
+
+
+def dataframe_to_arrays(df, index=True, dtypes=None, keep_categoricals=False):
+    '''
+    Get the columns of a dataframe as dict of numpy arrays,
+    with the same names `df.to_records` would use, but
+    without building a structured array.
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        The data
+    index: bool
+        If True, also include the index
+    dtypes: dict
+        if given, a mapping of column names to dtypes for conversion.
+    keep_categoricals: bool
+        If True, categorical columns are returned as `pd.Categorical`
+        instead of being converted to numpy arrays
+    '''
+    arrays = {}
+
+    if index:
+        if isinstance(df.index, pd.MultiIndex):
+            for i in range(df.index.nlevels):
+                name = df.index.names[i]
+                name = 'level_{}'.format(i) if name is None else str(name)
+                arrays[name] = df.index.get_level_values(i).to_numpy()
+        else:
+            name = 'index' if df.index.name is None else str(df.index.name)
+            arrays[name] = df.index.to_numpy()
+
+    for col in df.columns:
+        if keep_categoricals and isinstance(df[col].dtype, pd.CategoricalDtype):
+            arrays[str(col)] = df[col].values
+        else:
+            arrays[str(col)] = df[col].to_numpy()
+
+    if dtypes is not None:
+        for col, dtype in dtypes.items():
+            arrays[col] = arrays[col].astype(dtype)
+
+    return arrays
+
+
+class H5PyAppender:
+    '''
+    Incrementally append dataframes to an h5py style hdf5 file.
+
+    In contrast to calling `to_h5py` repeatedly, the file is kept open,
+    rows are buffered in memory and written in large blocks.
+    Each column is written up to its last complete hdf5 chunk, only
+    columns with chunks larger than `buffer_size` also write the
+    incomplete chunk, which is then rewritten by the next flush.
+    Datasets are grown geometrically and trimmed
+    to the number of rows when the appender is closed.
+
+    Use it as a context manager:
+
+    >>> with H5PyAppender('events.hdf5', key='events') as appender:
+    ...     for df in dfs:
+    ...         appender.append(df)
+
+    Parameters
+    ----------
+    filename: str
+        output file name
+    key: str
+        the name for the hdf5 group to hold all datasets, default: data
+    mode: str
+        'w' to overwrite existing files, 'a' to append
+    index: bool
+        If True, also save the index of the dataframes
+    dtypes: dict
+        if given, a mapping of column names to dtypes for conversion.
+    buffer_size: int
+        Maximum number of rows buffered per column before writing to the file,
+        at most one appended dataframe more is kept in memory
+    growth_factor: float
+        Factor by which datasets are enlarged if they are too small
+    encode_categoricals: bool
+        If True, store categorical columns as integer codes,
+        see `to_h5py`
+    n_threads: int or None
+        Number of threads used to compress chunks, see `to_h5py`
+
+    All `**kwargs` are passed to `create_empty_h5py_dataset`
+    '''
+
+    def __init__(
+            self,
+            filename,
+            key='data',
+            mode='a',
+            index=True,
+            dtypes=None,
+            buffer_size=100000,
+            growth_factor=2,
+            encode_categoricals=False,
+            n_threads=1,
+            **kwargs):
+        assert mode in ('w', 'a'), 'mode has to be either "a" or "w"'
+
+        self.key = key
+        self.index = index
+        self.dtypes = dtypes
+        self.buffer_size = buffer_size
+        self.growth_factor = growth_factor
+        self.encode_categoricals = encode_categoricals
+        self.n_threads = n_threads
+        self.kwargs = kwargs
+
+        self.file = h5py.File(filename, mode=mode)
+        self.group = self.file.get(key)
+        self.buffers = None
+        self.n_written = None
+        self.n_rows = 0
+
+        if self.group is not None:
+            self.buffers = {name: [] for name in self.group.keys()}
+            self.n_rows = self.group[next(iter(self.group.keys()))].shape[0]
+            self.n_written = {name: self.n_rows for name in self.buffers}
+
+    @property
+    def n_buffered(self):
+        ''' Largest number of rows buffered for a column '''
+        if self.n_written is None:
+            return 0
+        return self.n_rows - min(self.n_written.values())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def append(self, df):
+        ''' Append the rows of `df` '''
+        arrays = dataframe_to_arrays(
+            df,
+            index=self.index,
+            dtypes=self.dtypes,
+            keep_categoricals=self.encode_categoricals,
+        )
+
+        if self.group is None:
+            self.group = self.file.create_group(self.key)
+            for name, array in arrays.items():
+                create_empty_h5py_dataset(array, self.group, name, **self.kwargs)
+            self.buffers = {name: [] for name in arrays}
+            self.n_written = {name: 0 for name in arrays}
+
+        # check before appending anything, so a failed append
+        # does not leave the buffers misaligned
+        for name in arrays:
+            if name not in self.buffers:
+                raise KeyError('No such dataset {}'.format(name))
+
+        for name in self.buffers:
+            if name not in arrays:
+                raise KeyError('Missing column {}'.format(name))
+
+        for name, buffer in self.buffers.items():
+            buffer.append(arrays[name])
+
+        self.n_rows += len(df)
+        if self.n_buffered >= self.buffer_size:
+            self.flush(complete=False)
+
+    def flush(self, complete=True):
+        '''
+        Write buffered rows to the file.
+        If `complete` is False, only rows up to the last
+        hdf5 chunk boundary of each column are written,
+        unless the chunks are larger than `buffer_size`.
+        '''
+        for name, buffer in self.buffers.items():
+            start = self.n_written[name]
+            n_write = self.n_rows - start
+            if n_write == 0:
+                continue
+
+            dataset = self.group[name]
+            chunks = dataset.chunks
+            if not complete and chunks is not None and chunks[0] <= self.buffer_size:
+                end = self.n_rows // chunks[0] * chunks[0]
+                n_write = max(end - start, 0)
+                if n_write == 0:
+                    continue
+
+            data = np.concatenate(buffer) if len(buffer) > 1 else buffer[0]
+            end = start + n_write
+            if dataset.shape[0] < end:
+                new_size = max(end, int(self.growth_factor * dataset.shape[0]))
+                dataset.resize(new_size, axis=0)
+
+            write_h5py_rows(
+                dataset,
+                prepare_h5py_data(data[:n_write], dataset.attrs),
+                start,
+                n_threads=self.n_threads,
+            )
+
+            self.buffers[name] = [data[n_write:]] if n_write < len(data) else []
+            self.n_written[name] = end
+
+    def close(self):
+        '''
+        Write all buffered rows, trim datasets to their
+        final size and close the file.
+        '''
+        if not self.file:
+            return
+
+        if self.group is not None:
+            self.flush()
+            for dataset in self.group.values():
+                if dataset.shape[0] != self.n_rows:
+                    dataset.resize(self.n_rows, axis=0)
+
+        self.file.close()
 
 
 def read_simulated_spectrum(corsika_headers_path):
@@ -30,6 +30,7 @@ setup(
             'fact_calculate_radec = fact.analysis.scripts.radec:main',
         ]
     },
+    python_requires='>=3.7',
     tests_require=['pytest>=3.0.0'],
     setup_requires=['pytest-runner'],
     install_requires=[
@@ -49,5 +50,9 @@ setup(
         'tables>=3.3',  # pytables in anaconda
         'wrapt',
     ],
+    extras_require={
+        'arrow': ['pyarrow'],
+        'blosc': ['blosc'],
+    },
     zip_safe=False,
 )
@@ -43,3 +43,182 @@ def test_power_law_integral():
     )
     assert np.isclose(result.value, 0.009)
     assert result.unit == (FLUX_UNIT * u.GeV)
+
+
+def test_split_on_off_chunked():
+    import tempfile
+    import numpy as np
+    import pandas as pd
+    from fact.io import to_h5py, read_h5py
+    from fact.analysis import (
+        split_on_off_source_independent,
+        split_on_off_source_independent_chunked,
+    )
+
+    n_events = 1000
+    rng = np.random.RandomState(0)
+    events = pd.DataFrame({
+        'night': np.full(n_events, 20170101),
+        'run_id': rng.randint(1, 10, n_events),
+        'theta_deg': rng.uniform(0, 1, n_events),
+    })
+    for i in range(1, 6):
+        events['theta_deg_off_{}'.format(i)] = rng.uniform(0, 1, n_events)
+
+    on_data, off_data = split_on_off_source_independent(events, 0.1)
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as infile, \
+            tempfile.NamedTemporaryFile(suffix='.hdf5') as outfile:
+        to_h5py(events, infile.name, key='events', index=False)
+
+        n_on, n_off = split_on_off_source_independent_chunked(
+            infile.name, outfile.name, 0.1, chunksize=128
+        )
+        assert n_on == len(on_data)
+        assert n_off == len(off_data)
+
+        on_chunked = read_h5py(outfile.name, key='on')
+        off_chunked = read_h5py(outfile.name, key='off')
+
+        assert (on_chunked.index == on_data.index).all()
+        assert np.all(on_chunked['theta_deg'] == on_data['theta_deg'])
+
+        # chunked output is ordered by chunk, then off region
+        off_data = off_data.reset_index().sort_values(['index', 'off_region'])
+        off_chunked = off_chunked.reset_index().sort_values(['index', 'off_region'])
+        assert np.all(off_chunked['index'].values == off_data['index'].values)
+        assert np.all(off_chunked['theta_deg'].values == off_data['theta_deg'].values)
+
+
+def test_split_on_off_chunked_buffer(monkeypatch):
+    import tempfile
+    import numpy as np
+    import pandas as pd
+    import fact.analysis.core
+    from fact.io import to_h5py, read_h5py, H5PyAppender
+    from fact.analysis import split_on_off_source_independent_chunked
+
+    n_buffered = []
+
+    class RecordingAppender(H5PyAppender):
+        def append(self, df):
+            super().append(df)
+            n_buffered.append(self.n_buffered)
+
+    monkeypatch.setattr(fact.analysis.core, 'H5PyAppender', RecordingAppender)
+
+    n_events = 20000
+    rng = np.random.RandomState(0)
+    events = pd.DataFrame({
+        'timestamp': pd.Timestamp('2017-01-01') + pd.to_timedelta(np.arange(n_events), unit='s'),
+        'theta_deg': rng.uniform(0, 1, n_events),
+    })
+    for i in range(1, 6):
+        events['theta_deg_off_{}'.format(i)] = rng.uniform(0, 1, n_events)
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as infile, \
+            tempfile.NamedTemporaryFile(suffix='.hdf5') as outfile:
+        to_h5py(events, infile.name, key='events', index=False)
+
+        n_on, n_off = split_on_off_source_independent_chunked(
+            infile.name, outfile.name, 0.1, chunksize=1000
+        )
+        assert n_off > 5 * 1000
+
+        # the appenders never buffer more than one chunk
+        assert max(n_buffered) < 1000
+        assert len(read_h5py(outfile.name, key='off')) == n_off
+
+
+def test_split_on_off():
+    import numpy as np
+    import pandas as pd
+    from fact.analysis import split_on_off_source_independent
+
+    n_events = 500
+    rng = np.random.RandomState(0)
+    events = pd.DataFrame({
+        'night': rng.randint(0, 5, n_events),
+        'theta_deg': rng.uniform(0, 1, n_events),
+    })
+    for i in range(1, 6):
+        events['theta_deg_off_{}'.format(i)] = rng.uniform(0, 1, n_events)
+    events['gamma_prediction'] = rng.uniform(0, 1, n_events)
+    events.index = rng.permutation(n_events)
+
+    on_data, off_data = split_on_off_source_independent(events, 0.1)
+
+    assert (on_data.index == events.index[events.theta_deg <= np.sqrt(0.1)]).all()
+    assert list(on_data.columns) == list(events.columns)
+    assert list(off_data.columns) == ['night', 'gamma_prediction', 'off_region', 'theta_deg']
+
+    # ordered by region first, then by event
+    assert (np.diff(off_data['off_region']) >= 0).all()
+    for region in range(1, 6):
+        selected = events[events['theta_deg_off_{}'.format(region)] <= np.sqrt(0.1)]
+        off_region = off_data[off_data['off_region'] == region]
+        assert (off_region.index == selected.index).all()
+        assert np.all(off_region['theta_deg'] == selected['theta_deg_off_{}'.format(region)])
+        assert np.all(off_region['gamma_prediction'] == selected['gamma_prediction'])
+
+    # columns differ between regions, selected region by region
+    events['phi_deg'] = 0.0
+    events['phi_deg_off_1'] = 1.0
+    on_data, off_data = split_on_off_source_independent(events, 0.1)
+    assert list(off_data.columns) == [
+        'night', 'gamma_prediction', 'off_region', 'theta_deg', 'phi_deg'
+    ]
+    assert np.all(off_data['phi_deg'] == np.where(off_data['off_region'] == 1, 1.0, 0.0))
+
+
+def test_cumulative_run_histogram():
+    import numpy as np
+    import pandas as pd
+    from fact.analysis import calc_run_summary_source_independent, CumulativeRunHistogram
+
+    n_events = 5000
+    rng = np.random.RandomState(0)
+    runs = pd.DataFrame({
+        'night': [20170102, 20170101, 20170101, 20170103],
+        'run_id': [1, 2, 1, 5],
+        'ontime': [300.0, 295.0, 290.0, 280.0],
+    })
+    events = pd.DataFrame({
+        'night': rng.choice([20170101, 20170102], n_events),
+        'run_id': rng.randint(1, 4, n_events),
+        'gamma_prediction': rng.uniform(0, 1, n_events).round(2),
+        'theta_deg': rng.uniform(0, 0.5, n_events),
+    })
+    for i in range(1, 6):
+        events['theta_deg_off_{}'.format(i)] = rng.uniform(0, 0.5, n_events)
+    events.loc[0, 'theta_deg'] = np.nan
+    events.loc[1, 'gamma_prediction'] = np.nan
+
+    thresholds = np.round(np.arange(0.5, 1, 0.05), 2)
+    theta2_cuts = [0.01, 0.025, 0.05, 0.1]
+    hist = CumulativeRunHistogram(events, runs, thresholds, theta2_cuts)
+
+    n_on, n_off, significance = hist.scan()
+    assert n_on.shape == n_off.shape == significance.shape == (10, 4)
+
+    for i, threshold in enumerate(thresholds):
+        for j, theta2_cut in enumerate(theta2_cuts):
+            expected = calc_run_summary_source_independent(
+                events, runs, threshold, theta2_cut
+            )
+            summary = hist.run_summary(threshold, theta2_cut)
+
+            assert list(summary.columns) == list(expected.columns)
+            for col in expected.columns:
+                assert np.all(summary[col].values == expected[col].values), col
+
+            assert n_on[i, j] == expected['n_on'].sum()
+            assert n_off[i, j] == expected['n_off'].sum()
+
+    with raises(ValueError):
+        hist.run_summary(0.51, 0.01)
+
+    # grid values with rounding errors are found
+    hist = CumulativeRunHistogram(events, runs, np.arange(0.5, 1, 0.05), theta2_cuts)
+    assert hist.grid_index(0.8, 0.025) == (6, 1)
+    assert len(hist.run_summary(0.8, 0.025)) == len(runs)
@@ -0,0 +1,275 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def simulate_runs(n_runs, seed=0):
+    rng = np.random.RandomState(seed)
+    duration = rng.uniform(250, 300, n_runs)
+    gap = np.where(rng.uniform(size=n_runs) < 0.1, 3600, 30)
+    start = np.cumsum(duration + gap)
+
+    runs = pd.DataFrame({
+        'run_start': pd.Timestamp('2013-01-01') + pd.to_timedelta(start, unit='s'),
+        'ontime': duration * rng.uniform(0.9, 0.99, n_runs),
+        'n_on': rng.poisson(20, n_runs),
+        'n_off': rng.poisson(50, n_runs),
+        'source': rng.choice(['Crab', 'Mrk 501'], n_runs),
+    })
+    runs['run_stop'] = runs['run_start'] + pd.to_timedelta(duration, unit='s')
+    runs['fOnTimeAfterCuts'] = runs['ontime'] * 0.98
+    return runs
+
+
+def test_ontime_binning():
+    from fact.analysis.binning import ontime_binning
+
+    runs = pd.DataFrame({
+        'run_start': pd.to_datetime([
+            '2017-01-01 20:00', '2017-01-01 20:05', '2017-01-01 20:10',
+            '2017-01-01 20:15', '2017-01-01 21:00',
+        ]),
+        'ontime': [300, 300, 300, 300, 300],
+    })
+    runs['run_stop'] = runs['run_start'] + pd.Timedelta(minutes=5)
+    runs.index = [5, 4, 3, 2, 1]
+
+    bins = ontime_binning(runs, bin_width_minutes=10)
+    assert bins.dtype == np.int64
+    assert (bins.index == runs.index).all()
+    # ontime full after two runs, gap of 40 minutes before the last run
+    assert bins.tolist() == [0, 0, 1, 1, 2]
+
+
+def test_ontime_binning_reference():
+    import datetime
+    from fact.analysis.binning import ontime_binning
+
+    runs = simulate_runs(500)
+
+    # previous, row by row implementation
+    bin_width_sec = 20 * 60
+    bin_number = 0
+    ontime_sum = 0
+    expected = []
+    last_stop = runs['run_start'].iloc[0]
+    for key, row in runs.iterrows():
+        delta_t = row.run_start - last_stop
+        last_stop = row.run_stop
+        if ontime_sum + row.ontime > bin_width_sec or delta_t > datetime.timedelta(seconds=bin_width_sec):
+            bin_number += 1
+            ontime_sum = 0
+        expected.append(bin_number)
+        ontime_sum += row.ontime
+
+    assert ontime_binning(runs).tolist() == expected
+
+
+def test_qla_binning():
+    from fact.analysis.binning import qla_binning
+
+    runs = pd.DataFrame({
+        'fOnTimeAfterCuts': [250, 250, 250, 250, 700],
+        'ontime': [300, 300, 300, 300, 300],
+    })
+
+    # the threshold uses fOnTimeAfterCuts, but ontime is summed
+    assert qla_binning(runs, bin_width_minutes=10).tolist() == [0, 0, 1, 1, 2]
+
+
+def test_bin_runs():
+    from fact.analysis.binning import bin_runs, ontime_binning
+
+    runs = simulate_runs(300).sample(frac=1, random_state=0)
+    binned = bin_runs(runs)
+
+    assert binned.index.name == 'bin'
+    assert list(binned.columns) == [
+        'ontime', 'n_on', 'n_off', 'run_start', 'run_stop',
+        'n_excess', 'excess_rate_per_h', 'time_width', 'time_mean',
+        'excess_rate_err', 'significance', 'source', 'night',
+    ]
+    assert binned['source'].tolist() == sorted(binned['source'])
+    assert binned['n_on'].sum() == runs['n_on'].sum()
+
+    for source in ('Crab', 'Mrk 501'):
+        source_runs = runs[runs.source == source].sort_values('run_start')
+        source_binned = binned[binned.source == source]
+        bins = ontime_binning(source_runs)
+
+        assert (source_binned.index == np.unique(bins)).all()
+        assert (source_binned['ontime'].values == source_runs.groupby(bins)['ontime'].sum().values).all()
+        assert (source_binned['run_start'].values == source_runs.groupby(bins)['run_start'].min().values).all()
+
+    night = (binned.time_mean - pd.Timedelta(hours=12)).dt.strftime('%Y%m%d').astype(int)
+    assert (binned['night'] == night).all()
+
+
+def test_online_light_curve():
+    from fact.analysis.binning import bin_runs, OnlineLightCurve
+
+    runs = simulate_runs(300)
+    expected = bin_runs(runs)
+
+    light_curve = OnlineLightCurve()
+    updates = []
+    for start in range(0, len(runs), 7):
+        changed = light_curve.update(runs.iloc[start:start + 7])
+        assert len(changed) <= 7 + 2
+        updates.append(changed)
+
+    # the last update of each bin is the final bin
+    result = pd.concat(updates).reset_index()
+    result = result.drop_duplicates(['source', 'bin'], keep='last')
+    result = result.sort_values(['source', 'bin']).set_index('bin')
+
+    assert list(result.columns) == list(expected.columns)
+    assert (result.index == expected.index).all()
+    for col in ('n_on', 'n_off', 'run_start', 'run_stop', 'source', 'night'):
+        assert (result[col] == expected[col]).all()
+    for col in ('ontime', 'excess_rate_per_h', 'significance'):
+        assert np.allclose(result[col], expected[col])
+
+    with pytest.raises(ValueError):
+        light_curve.update(runs.iloc[:1])
+
+    assert len(light_curve.update(runs.iloc[:0])) == 0
+
+
+def test_online_light_curve_long_first_run():
+    from fact.analysis.binning import bin_runs, OnlineLightCurve
+
+    runs = simulate_runs(50)
+    # the first run of each source has more ontime than a bin
+    first = runs.sort_values('run_start').groupby('source').head(1).index
+    runs.loc[first, 'ontime'] = 1500
+    expected = bin_runs(runs, bin_width_minutes=20)
+
+    light_curve = OnlineLightCurve(bin_width_minutes=20)
+    result = pd.concat([light_curve.update(runs.iloc[:10]), light_curve.update(runs.iloc[10:])])
+    result = result.reset_index().drop_duplicates(['source', 'bin'], keep='last')
+    result = result.sort_values(['source', 'bin']).set_index('bin')
+
+    assert expected.groupby('source').head(1).index.tolist() == [1, 1]
+    assert (result.index == expected.index).all()
+    for col in ('n_on', 'n_off', 'run_start', 'source'):
+        assert (result[col] == expected[col]).all()
+    assert np.allclose(result['ontime'], expected['ontime'])
+
+
+def test_nightly_binning():
+    from fact.analysis.binning import nightly_binning
+
+    runs = pd.DataFrame({'night': [20170103, 20170101, 20170101, 20170102, 20170103]})
+    runs.index = [10, 11, 12, 13, 14]
+
+    bins = nightly_binning(runs)
+    assert bins.tolist() == [0, 1, 1, 2, 0]
+    assert (bins.index == runs.index).all()
+
+
+def test_calendar_binning():
+    from fact.analysis.binning import weekly_binning, monthly_binning, calendar_binning
+
+    # 2017-01-01 is a sunday
+    runs = pd.DataFrame({'night': [20161231, 20170101, 20170102, 20170108, 20170131, 20170201]})
+
+    assert weekly_binning(runs).tolist() == [0, 0, 1, 1, 2, 2]
+    assert monthly_binning(runs).tolist() == [0, 1, 1, 1, 1, 2]
+    assert calendar_binning(runs, 'Y').tolist() == [0, 1, 1, 1, 1, 1]
+
+
+def test_moon_period_binning():
+    from fact.analysis.binning import (
+        moon_period_binning, FULL_MOON_REFERENCE, SYNODIC_MONTH_DAYS
+    )
+
+    full_moon = FULL_MOON_REFERENCE + 210 * pd.Timedelta(days=SYNODIC_MONTH_DAYS)
+    # full moon of 2017-01-12 11:34 UTC
+    assert abs(full_moon - pd.Timestamp('2017-01-12 11:34')) < pd.Timedelta(hours=12)
+
+    runs = pd.DataFrame({'run_start': full_moon + pd.to_timedelta([-20, -1, 1, 20, 40], unit='D')})
+    assert moon_period_binning(runs).tolist() == [0, 0, 1, 1, 2]
+
+    runs['run_start'] = runs['run_start'].dt.tz_localize('UTC').dt.tz_convert('Europe/Berlin')
+    assert moon_period_binning(runs).tolist() == [0, 0, 1, 1, 2]
+
+
+def test_bin_runs_calendar():
+    from fact.analysis.binning import bin_runs, monthly_binning
+
+    runs = simulate_runs(300)
+    runs['night'] = (runs.run_start - pd.Timedelta(hours=12)).dt.strftime('%Y%m%d').astype(int)
+
+    binned = bin_runs(runs, binning_function=monthly_binning)
+    assert binned['n_on'].sum() == runs['n_on'].sum()
+    assert len(binned) == 2 * len(np.unique(runs['night'] // 100))
+
+
+def test_significance_binning():
+    from fact.analysis.binning import significance_binning
+    from fact.analysis.statistics import li_ma_significance
+
+    runs = simulate_runs(500)
+    bins = significance_binning(runs, target_significance=3)
+
+    assert (np.diff(bins) >= 0).all()
+    n_on = runs.groupby(bins.values)['n_on'].sum()
+    n_off = runs.groupby(bins.values)['n_off'].sum()
+    significance = li_ma_significance(n_on, n_off, 0.2)
+    assert (significance[:-1] >= 3).all()
+
+    # a bin ends with the first run that reaches the target
+    for b in range(bins.iloc[-1]):
+        selected = runs[bins == b]
+        assert li_ma_significance(
+            selected.n_on.iloc[:-1].sum(), selected.n_off.iloc[:-1].sum()
+        ) < 3
+
+
+def test_bin_runs_alpha():
+    from fact.analysis.binning import bin_runs, significance_binning
+
+    runs = simulate_runs(500)
+    runs['source'] = 'Crab'
+
+    # the bins are chosen with the same alpha as the statistics
+    binned = bin_runs(runs, alpha=1 / 3, binning_function=significance_binning)
+    bins = significance_binning(runs, alpha=1 / 3)
+    assert len(binned) == bins.nunique()
+    assert (binned['significance'].iloc[:-1] >= 3).all()
+
+
+def test_bayesian_blocks_binning():
+    from fact.analysis.binning import bayesian_blocks_binning, bin_runs
+    from functools import partial
+
+    rng = np.random.RandomState(0)
+    n_runs = 300
+    runs = simulate_runs(n_runs)
+    runs['source'] = 'Mrk 501'
+    # flare between run 100 and run 150
+    rate = np.where((np.arange(n_runs) >= 100) & (np.arange(n_runs) < 150), 300, 5)
+    runs['n_on'] = rng.poisson(0.2 * runs['n_off'] + rate * runs['ontime'] / 3600)
+
+    bins = bayesian_blocks_binning(runs)
+    change_points = np.flatnonzero(np.diff(bins)) + 1
+    assert (np.diff(bins) >= 0).all()
+    assert np.abs(change_points - 100).min() <= 2
+    assert np.abs(change_points - 150).min() <= 2
+
+    # a higher prior for new blocks merges everything
+    assert (bayesian_blocks_binning(runs, ncp_prior=1e6) == 0).all()
+
+    binned = bin_runs(runs, binning_function=partial(bayesian_blocks_binning, alpha=0.2))
+    assert len(binned) == len(change_points) + 1
+    assert binned['n_on'].sum() == runs['n_on'].sum()
+
+
+def test_bayesian_blocks_binning_constant():
+    from fact.analysis.binning import bayesian_blocks_binning
+
+    # no change points in a light curve without variability
+    for seed in range(5):
+        runs = simulate_runs(2000, seed=seed)
+        assert (bayesian_blocks_binning(runs) == 0).all()
@@ -348,3 +348,777 @@ def test_read_simulated_spectrum():
     assert s['energy_min'] == 100 * u.GeV
     assert s['energy_max'] == 200 * u.TeV
     assert s['energy_spectrum_slope'] == -2.0
+
+
+def test_read_h5py_chunked():
+    from fact.io import to_h5py, read_h5py, read_h5py_chunked
+
+    df = pd.DataFrame({
+        'x': np.random.normal(size=105),
+        'N': np.random.randint(0, 10, dtype='uint8', size=105),
+    })
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        to_h5py(df, f.name, key='test', index=False)
+        df_full = read_h5py(f.name, key='test')
+
+        chunks = list(read_h5py_chunked(f.name, key='test', chunksize=10))
+        assert len(chunks) == 11
+        for chunk, start, end in chunks:
+            assert len(chunk) == end - start
+            assert chunk.equals(df_full.iloc[start:end])
+
+        df_chunked = pd.concat([chunk for chunk, start, end in chunks])
+        assert df_chunked.equals(df_full)
+
+
+def test_read_h5py_chunked_aligned():
+    from fact.io import to_h5py, read_h5py, read_h5py_chunked
+
+    df = pd.DataFrame({'x': np.random.normal(size=100)})
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        to_h5py(df, f.name, key='test', index=False, chunks=(16, ))
+
+        it = read_h5py_chunked(f.name, key='test', chunksize=20, align_chunks=True)
+        chunks = list(it)
+        assert [(start, end) for _, start, end in chunks] == [(0, 32), (32, 64), (64, 96), (96, 100)]
+
+        df_chunked = pd.concat([chunk for chunk, start, end in chunks])
+        assert df_chunked.equals(read_h5py(f.name, key='test'))
+
+
+def test_read_h5py_chunked_aligned_mixed_columns():
+    from fact.io import to_h5py, read_h5py, read_h5py_chunked, MAX_ALIGN_FACTOR
+
+    n_rows = 50000
+    df = pd.DataFrame({
+        'x': np.random.normal(size=n_rows),
+        't': pd.date_range('2017-01-01', periods=n_rows, freq='s'),
+        'v': [[i, 2 * i, 3 * i] for i in range(n_rows)],
+        'b': np.arange(n_rows) % 3 == 0,
+    })
+    columns = ['x', 't', 'v', 'b']
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        # the columns get different chunk shapes
+        to_h5py(df, f.name, key='test', index=False)
+        df_full = read_h5py(f.name, key='test', columns=columns)
+
+        for chunksize in (100, 1000, 20000):
+            it = read_h5py_chunked(
+                f.name, key='test', columns=columns, chunksize=chunksize, align_chunks=True
+            )
+            chunks = list(it)
+            assert len(chunks) > 1 or chunksize * MAX_ALIGN_FACTOR >= n_rows
+            assert all(end - start <= MAX_ALIGN_FACTOR * chunksize for _, start, end in chunks)
+
+            df_chunked = pd.concat([chunk for chunk, start, end in chunks])
+            assert df_chunked.equals(df_full)
+
+
+def test_read_h5py_arrays():
+    from fact.io import to_h5py, read_h5py, read_h5py_arrays, arrays_to_dataframe
+
+    df = pd.DataFrame({
+        'x': np.random.normal(size=10),
+        'name': ['Crab'] * 10,
+        's': [[i, 2 * i] for i in range(10)],
+        't': pd.date_range('2017-01-01', freq='1s', periods=10),
+    })
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        to_h5py(df, f.name, key='test')
+
+        arrays = read_h5py_arrays(f.name, key='test', columns=['x', 's', 't', 'name'])
+        assert arrays['s'].shape == (10, 2)
+        assert np.all(arrays['x'] == df['x'].values)
+        assert np.all(arrays['t'] == df['t'].values)
+
+        arrays = read_h5py_arrays(f.name, key='test', first=2, last=5)
+        assert arrays['x'].shape == (3, )
+
+        df_read = read_h5py(f.name, key='test', columns=['x', 's', 't', 'name'])
+        df_arrays = arrays_to_dataframe(
+            read_h5py_arrays(f.name, key='test', columns=['x', 's', 't', 'name'])
+        )
+        assert df_read.equals(df_arrays)
+
+
+def test_read_h5py_arrays_byteorder():
+    from fact.io import read_h5py_arrays
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        with h5py.File(f.name, 'w') as h5file:
+            h5file.create_dataset('data/x', data=np.arange(5, dtype='>f8'))
+
+        arrays = read_h5py_arrays(f.name)
+        assert arrays['x'].dtype.isnative
+        assert np.all(arrays['x'] == np.arange(5))
+
+
+def test_read_h5py_where():
+    from fact.io import to_h5py, read_h5py
+
+    df = pd.DataFrame({
+        'gamma_prediction': np.random.uniform(0, 1, 1000),
+        'theta_deg': np.random.uniform(0, 1, 1000),
+        'name': ['Crab'] * 1000,
+        's': [[i, 2 * i] for i in range(1000)],
+    })
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        to_h5py(df, f.name, key='events', index=False)
+        df_all = read_h5py(f.name, key='events', columns=['gamma_prediction', 'name', 's'])
+
+        query = 'gamma_prediction >= 0.8'
+        df_where = read_h5py(
+            f.name, key='events', columns=['gamma_prediction', 'name', 's'], where=query,
+        )
+        assert df_where.equals(df_all.query(query))
+
+        df_where = read_h5py(f.name, key='events', columns=['theta_deg'], where='s_1 < 100')
+        assert np.all(df_where.index == np.arange(50))
+
+        mask = df['theta_deg'].values < 0.1
+        df_where = read_h5py(f.name, key='events', where=mask)
+        assert np.all(df_where.index == np.flatnonzero(mask))
+        assert np.all(df_where['theta_deg'] < 0.1)
+
+        df_where = read_h5py(f.name, key='events', where=[5, 500, 3], first=100)
+        assert np.all(df_where.index == [103, 105, 600])
+        assert np.all(df_where['theta_deg'].values == df['theta_deg'].values[[103, 105, 600]])
+
+
+def test_read_h5py_many():
+    from fact.io import to_h5py, read_h5py_many
+    import os
+
+    dfs = [
+        pd.DataFrame({
+            'x': np.random.normal(size=n),
+            'name': ['Crab'] * n,
+        })
+        for n in (10, 0, 25)
+    ]
+
+    with tempfile.TemporaryDirectory() as d:
+        paths = [os.path.join(d, 'run_{}.hdf5'.format(i)) for i in range(len(dfs))]
+        for df, p in zip(dfs, paths):
+            to_h5py(df, p, key='events', index=False)
+
+        expected = pd.concat(dfs, ignore_index=True)
+
+        for n_jobs in (1, 2):
+            df = read_h5py_many(paths[::-1], key='events', n_jobs=n_jobs, file_column='file')
+            assert len(df) == 35
+            assert np.all(df['x'].values == np.concatenate([dfs[2]['x'], dfs[0]['x']]))
+            assert np.all(df['file'].iloc[:25] == paths[2])
+            assert np.all(df['file'].iloc[25:] == paths[0])
+
+        df = read_h5py_many(os.path.join(d, '*.hdf5'), key='events')
+        assert df['x'].equals(expected['x'])
+        assert df['name'].equals(expected['name'])
+
+        df = read_h5py_many(paths, key='events', where='x > 0', columns=['x'])
+        assert np.all(df['x'].values == expected.query('x > 0')['x'].values)
+
+
+def test_h5py_appender():
+    from fact.io import H5PyAppender, to_h5py, read_h5py
+
+    dfs = [
+        pd.DataFrame({
+            'x': np.random.normal(size=n),
+            'name': ['Crab'] * n,
+            't': pd.date_range('2017-01-01', freq='1s', periods=n),
+            's': [[i, 2 * i] for i in range(n)],
+        })
+        for n in np.random.randint(1, 50, size=20)
+    ]
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        with H5PyAppender(f.name, key='events', index=False, buffer_size=100) as appender:
+            for df in dfs:
+                appender.append(df)
+
+        with tempfile.NamedTemporaryFile(suffix='.hdf5') as f2:
+            for df in dfs:
+                to_h5py(df, f2.name, key='events', index=False)
+
+            df_appender = read_h5py(f.name, key='events', columns=['x', 'name', 't', 's'])
+            df_to_h5py = read_h5py(f2.name, key='events', columns=['x', 'name', 't', 's'])
+
+        assert len(df_appender) == sum(len(df) for df in dfs)
+        assert df_appender.equals(df_to_h5py)
+
+        # append to existing group
+        with H5PyAppender(f.name, key='events', index=False) as appender:
+            appender.append(dfs[0])
+
+            with pytest.raises(KeyError):
+                appender.append(dfs[0].drop('x', axis=1))
+
+        with h5py.File(f.name, 'r') as hf:
+            assert all(d.shape[0] == len(df_to_h5py) + len(dfs[0]) for d in hf['events'].values())
+
+
+def test_h5py_appender_failed_append():
+    from fact.io import H5PyAppender, read_h5py
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        with H5PyAppender(f.name, key='events', index=False) as appender:
+            appender.append(pd.DataFrame({'a': [1, 2], 'b': [10, 20]}))
+
+            with pytest.raises(KeyError):
+                appender.append(pd.DataFrame({'a': [3, 4]}))
+
+            with pytest.raises(KeyError):
+                appender.append(pd.DataFrame({'a': [3, 4], 'b': [30, 40], 'c': [0, 0]}))
+
+            appender.append(pd.DataFrame({'a': [5, 6], 'b': [50, 60]}))
+
+        df = read_h5py(f.name, key='events')
+        assert df['a'].tolist() == [1, 2, 5, 6]
+        assert df['b'].tolist() == [10, 20, 50, 60]
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'chunks': (300, )}])
+def test_h5py_appender_buffer_size(kwargs):
+    from fact.io import H5PyAppender, to_h5py, read_h5py
+
+    def make_df(start, n):
+        df = pd.DataFrame({
+            'x': np.arange(start, start + n, dtype=float),
+            'b': np.arange(start, start + n) % 3 == 0,
+            't': pd.Timestamp('2017-01-01') + pd.to_timedelta(np.arange(start, start + n), unit='s'),
+        })
+        if not kwargs:
+            df['s'] = [[i, 2 * i, 3 * i] for i in range(start, start + n)]
+        return df
+
+    dfs = [make_df(1000 * i, 1000) for i in range(30)]
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        with H5PyAppender(f.name, key='events', index=False, buffer_size=1000, **kwargs) as appender:
+            for df in dfs:
+                appender.append(df)
+                assert appender.n_buffered < 1000
+
+        with tempfile.NamedTemporaryFile(suffix='.hdf5') as f2:
+            to_h5py(pd.concat(dfs, ignore_index=True), f2.name, key='events', index=False)
+
+            columns = list(dfs[0].columns)
+            df_appender = read_h5py(f.name, key='events', columns=columns)
+            assert df_appender.equals(read_h5py(f2.name, key='events', columns=columns))
+
+
+def test_to_h5py_dtypes():
+    from fact.io import to_h5py, read_h5py
+
+    df = pd.DataFrame({
+        'x': np.random.normal(size=50),
+        'N': np.random.randint(0, 10, size=50),
+    })
+    df.index.name = 'event'
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        to_h5py(df, f.name, key='test', dtypes={'x': 'float32', 'N': 'uint8'})
+
+        with h5py.File(f.name, 'r') as hf:
+            assert set(hf['test'].keys()) == set(df.to_records().dtype.names)
+            assert hf['test']['x'].dtype == np.float32
+            assert hf['test']['N'].dtype == np.uint8
+
+        df2 = read_h5py(f.name, key='test')
+        assert np.all(df2['event'] == df.index)
+        assert np.all(df2['N'] == df['N'])
+
+
+def test_plan_h5py_chunks():
+    from fact.io import plan_h5py_chunks
+
+    assert plan_h5py_chunks(np.float64, (0, )) == (2**17, )
+    assert plan_h5py_chunks(np.float32, (0, 4)) == (2**16, 4)
+    assert plan_h5py_chunks(np.float64, (0, ), expected_rows=50) == (1024, )
+    assert plan_h5py_chunks(np.float64, (0, ), expected_rows=5000) == (8192, )
+    assert plan_h5py_chunks(np.float64, (0, 2**20)) == (1, 2**20)
+
+    # chunk rows are powers of two, also for odd row sizes
+    assert plan_h5py_chunks(np.float64, (0, 3)) == (2**15, 3)
+    assert plan_h5py_chunks(np.dtype('S29'), (0, )) == (2**15, )
+    assert plan_h5py_chunks(np.float64, (0, 300), expected_rows=5000) == (256, 300)
+
+
+def test_to_h5py_profile():
+    from fact.io import to_h5py, read_h5py
+
+    df = pd.DataFrame({
+        'x': np.random.normal(size=5000),
+        's': [[i, 2 * i] for i in range(5000)],
+    })
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        to_h5py(df, f.name, key='test', profile='small-file')
+
+        with h5py.File(f.name, 'r') as hf:
+            assert hf['test']['x'].chunks == (8192, )
+            assert hf['test']['s'].chunks == (8192, 2)
+
+        df2 = read_h5py(f.name, key='test')
+        assert np.all(df2['x'] == df['x'])
+
+        with pytest.raises(ValueError):
+            to_h5py(df, f.name, key='test2', profile='foo')
+
+
+def test_default_compression(monkeypatch):
+    from fact.io import get_default_compression, to_h5py, COMPRESSION_ENV_VAR
+
+    monkeypatch.setenv(COMPRESSION_ENV_VAR, 'gzip')
+    assert get_default_compression() == {'compression': 'gzip'}
+
+    df = pd.DataFrame({'x': np.random.normal(size=50)})
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        to_h5py(df, f.name, key='test')
+        with h5py.File(f.name, 'r') as hf:
+            assert hf['test']['x'].compression == 'gzip'
+
+    monkeypatch.setenv(COMPRESSION_ENV_VAR, 'none')
+    assert get_default_compression() == {}
+
+    monkeypatch.setenv(COMPRESSION_ENV_VAR, 'foo')
+    with pytest.raises(ValueError):
+        get_default_compression()
+
+
+def test_blosc_check_cache(monkeypatch):
+    from fact.io import check_blosc_available, CACHE_DIR_ENV_VAR
+    import os
+    import json
+
+    with tempfile.TemporaryDirectory() as d:
+        monkeypatch.setenv(CACHE_DIR_ENV_VAR, d)
+        available = check_blosc_available()
+
+        with open(os.path.join(d, 'h5py_blosc.json')) as f:
+            cache = json.load(f)
+        assert list(cache.values()) == [available]
+        assert check_blosc_available() == available
+
+
+def test_to_h5py_contiguous_memmap():
+    from fact.io import to_h5py, read_h5py, read_h5py_arrays
+
+    df = pd.DataFrame({
+        'x': np.random.normal(size=100),
+        'name': ['Crab'] * 100,
+        's': [[i, 2 * i] for i in range(100)],
+        't': pd.date_range('2017-01-01', freq='1s', periods=100),
+    })
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        to_h5py(df, f.name, key='test', contiguous=True)
+
+        with h5py.File(f.name, 'r') as hf:
+            assert hf['test']['x'].chunks is None
+
+        with pytest.raises(ValueError):
+            to_h5py(df, f.name, key='test', contiguous=True)
+
+        arrays = read_h5py_arrays(f.name, key='test', columns=['x', 's', 'name'], memmap=True, first=10)
+        assert isinstance(arrays['x'], np.memmap)
+        assert isinstance(arrays['s'], np.memmap)
+        assert arrays['s'].shape == (90, 2)
+        assert np.all(arrays['x'] == df['x'].values[10:])
+        assert np.all(arrays['name'] == 'Crab')
+
+        columns = ['x', 's', 'name', 't']
+        df_memmap = read_h5py(f.name, key='test', columns=columns, memmap=True)
+        assert df_memmap.equals(read_h5py(f.name, key='test', columns=columns))
+
+        df_memmap = read_h5py(f.name, key='test', where='x > 0', memmap=True)
+        assert df_memmap.equals(read_h5py(f.name, key='test').query('x > 0'))
+
+
+def test_to_h5py_datetime_unix():
+    from fact.io import to_h5py, read_h5py, H5PyAppender
+
+    df = pd.DataFrame({
+        't_ns': pd.date_range('2017-01-01', freq='1ns', periods=100),
+        't_s': pd.date_range('2017-01-01', freq='1s', periods=100),
+    })
+    df.loc[5, 't_s'] = pd.NaT
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        to_h5py(df, f.name, key='test', timeformat='unix')
+        to_h5py(df, f.name, key='test')
+
+        with h5py.File(f.name, 'r') as hf:
+            assert hf['test']['t_ns'].dtype == np.int64
+            assert hf['test']['t_ns'].attrs['timeformat'] == 'unix'
+            assert hf['test']['t_ns'].attrs['unit'] == 'ns'
+
+        df2 = read_h5py(f.name, key='test')
+        expected = pd.concat([df, df], ignore_index=True)
+        for col in df.columns:
+            assert df2[col].dtype == expected[col].dtype
+            assert df2[col].reset_index(drop=True).equals(expected[col])
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        with H5PyAppender(f.name, key='test', timeformat='unix') as appender:
+            appender.append(df)
+        assert read_h5py(f.name, key='test')['t_s'].equals(df['t_s'])
+
+        with pytest.raises(ValueError):
+            to_h5py(df, f.name, key='test2', timeformat='foo')
+
+
+def test_read_h5py_categorical():
+    from fact.io import to_h5py, read_h5py
+
+    df = pd.DataFrame({
+        'source': np.random.choice(['Crab', 'Mrk 501', 'Mrk 421'], size=100),
+        'x': np.random.normal(size=100),
+    })
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        to_h5py(df, f.name, key='test', index=False)
+
+        df2 = read_h5py(f.name, key='test', categorical=['source'])
+        assert isinstance(df2['source'].dtype, pd.CategoricalDtype)
+        assert np.all(df2['source'] == df['source'])
+
+        df2 = read_h5py(f.name, key='test', categorical=True)
+        assert isinstance(df2['source'].dtype, pd.CategoricalDtype)
+
+        df2 = read_h5py(f.name, key='test')
+        assert df2['source'].dtype == object
+
+
+def test_to_h5py_encode_categoricals():
+    from fact.io import to_h5py, read_h5py, H5PyAppender
+
+    df1 = pd.DataFrame({'source': pd.Categorical(['Crab', 'Mrk 501', 'Crab', None])})
+    df2 = pd.DataFrame({'source': ['Mrk 421', 'Crab']})
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        to_h5py(df1, f.name, key='test', index=False, encode_categoricals=True)
+        to_h5py(df2, f.name, key='test', index=False)
+
+        with h5py.File(f.name, 'r') as hf:
+            assert hf['test']['source'].dtype == np.int32
+            assert list(hf['test']['source'].attrs['categories']) == ['Crab', 'Mrk 501', 'Mrk 421']
+
+        df = read_h5py(f.name, key='test')
+        assert isinstance(df['source'].dtype, pd.CategoricalDtype)
+        assert df['source'].isna().sum() == 1
+        expected = ['Crab', 'Mrk 501', 'Crab', None, 'Mrk 421', 'Crab']
+        assert df['source'].astype(object).where(df['source'].notna(), None).tolist() == expected
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        with H5PyAppender(f.name, key='test', index=False, encode_categoricals=True) as appender:
+            appender.append(df1)
+            appender.append(df1)
+
+        df = read_h5py(f.name, key='test')
+        assert isinstance(df['source'].dtype, pd.CategoricalDtype)
+        assert len(df) == 8
+
+
+@pytest.mark.parametrize('shuffle', [True, False])
+def test_read_h5py_threaded(shuffle):
+    from fact.io import to_h5py, read_h5py, read_h5py_arrays, read_h5py_dataset_threaded
+
+    df = pd.DataFrame({
+        'x': np.random.normal(size=5000),
+        'n': np.arange(5000, dtype='>i4'),
+        's': [[i, 2 * i] for i in range(5000)],
+    })
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        to_h5py(df, f.name, key='test', compression='gzip', shuffle=shuffle, chunks=True)
+
+        df_threaded = read_h5py(f.name, key='test', columns=['x', 'n', 's'], n_threads=4)
+        assert df_threaded.equals(read_h5py(f.name, key='test', columns=['x', 'n', 's']))
+
+        arrays = read_h5py_arrays(f.name, key='test', first=123, last=3789, n_threads=4)
+        assert np.all(arrays['x'] == df['x'].values[123:3789])
+
+        with h5py.File(f.name, 'r+') as hf:
+            dataset = hf['test']['x']
+            dataset.resize(20000, axis=0)
+            array = read_h5py_dataset_threaded(dataset, first=4900, n_threads=2)
+            assert np.all(array[:100] == df['x'].values[4900:])
+            assert np.all(array[100:] == 0)
+
+            fletcher = hf['test'].create_dataset('f', data=np.arange(10), fletcher32=True)
+            assert read_h5py_dataset_threaded(fletcher) is None
+
+
+@pytest.mark.parametrize('shuffle', [True, False])
+def test_to_h5py_threaded(shuffle):
+    from fact.io import to_h5py, read_h5py, H5PyAppender
+
+    df = pd.DataFrame({
+        'x': np.random.normal(size=5000),
+        'n': np.arange(5000),
+        's': [[i, 2 * i] for i in range(5000)],
+        't': pd.date_range('2017-01-01', freq='1s', periods=5000),
+    })
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        to_h5py(df.iloc[:1234], f.name, key='test', compression='gzip', shuffle=shuffle, chunks=True, n_threads=4)
+        to_h5py(df.iloc[1234:], f.name, key='test', n_threads=4)
+
+        # read without our own chunk decoding
+        df_read = read_h5py(f.name, key='test', columns=['x', 'n', 's', 't'])
+        assert df_read[['x', 'n', 't']].equals(df[['x', 'n', 't']])
+        assert np.all(df_read['s_1'] == 2 * df['n'])
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        with H5PyAppender(f.name, key='test', buffer_size=1000, compression='gzip', n_threads=2) as appender:
+            for start in range(0, 5000, 700):
+                appender.append(df.iloc[start:start + 700])
+
+        df_read = read_h5py(f.name, key='test', columns=['x', 'n', 's', 't'])
+        assert df_read[['x', 'n', 't']].equals(df[['x', 'n', 't']])
+        assert np.all(df_read['s_1'] == 2 * df['n'])
+
+
+def test_h5py_blosc_threaded():
+    pytest.importorskip('blosc')
+    from fact.io import to_h5py, read_h5py, create_blosc_compression_options, check_blosc_available
+
+    if not check_blosc_available():
+        pytest.skip('hdf5 blosc filter not available')
+
+    df = pd.DataFrame({
+        'x': np.random.normal(size=5000),
+        'n': np.arange(5000),
+    })
+
+    options = create_blosc_compression_options(complib='blosc:lz4')
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        to_h5py(df, f.name, key='test', chunks=(512, ), n_threads=2, **options)
+
+        # decompressed by the hdf5 filter
+        df_read = read_h5py(f.name, key='test')
+        assert df_read[df.columns].equals(df)
+
+        df_read = read_h5py(f.name, key='test', n_threads=2)
+        assert df_read[df.columns].equals(df)
+
+
+def test_h5py_threaded_fallback(monkeypatch):
+    import fact.io
+    from fact.io import to_h5py, read_h5py
+
+    # e.g. hdf5 < 1.10.5
+    monkeypatch.setattr(fact.io, 'h5py_direct_chunk_supported', lambda dataset: False)
+
+    df = pd.DataFrame({'x': np.random.normal(size=5000), 'n': np.arange(5000)})
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        to_h5py(df.iloc[:1234], f.name, key='test', compression='gzip', chunks=(512, ), n_threads=2)
+        to_h5py(df.iloc[1234:], f.name, key='test', n_threads=2)
+
+        df_read = read_h5py(f.name, key='test', n_threads=2)
+        assert df_read[df.columns].equals(df)
+
+
+def test_inspect_h5py():
+    from fact.io import to_h5py, inspect_h5py
+
+    df = pd.DataFrame({
+        'x': np.random.normal(size=50),
+        'name': ['Crab'] * 50,
+        's': [[i, 2 * i] for i in range(50)],
+        't': pd.date_range('2017-01-01', freq='1s', periods=50),
+    })
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        to_h5py(df, f.name, key='events', compression='gzip', timeformat='unix')
+
+        schema = inspect_h5py(f.name, key='events')
+        assert schema.n_rows == 50
+        assert list(schema.columns) == ['index', 'name', 's', 't', 'x']
+        assert schema.columns['s'].shape == (50, 2)
+        assert schema.columns['x'].dtype == np.float64
+        assert schema.columns['x'].compression == 'gzip'
+        assert schema.columns['t'].timeformat == 'unix'
+        assert schema.columns['x'].timeformat is None
+
+        with pytest.raises(IOError):
+            inspect_h5py(f.name, key='foo')
+
+
+@pytest.mark.parametrize('profile', ['balanced', 'fast-read', 'small-file'])
+def test_inspect_h5py_blosc_profile(profile):
+    from fact.io import (
+        create_empty_h5py_dataset, create_blosc_compression_options,
+        inspect_h5py, H5PY_PROFILES,
+    )
+
+    compression = H5PY_PROFILES[profile]['compression']
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        with h5py.File(f.name, 'w') as h5file:
+            group = h5file.create_group('events')
+            # only the dataset is created, no data has to pass the filter
+            create_empty_h5py_dataset(
+                np.zeros(10), group, 'x', profile=profile, allow_unknown_filter=True,
+                **create_blosc_compression_options(**compression)
+            )
+
+        schema = inspect_h5py(f.name, key='events')
+        assert schema.columns['x'].compression == compression['complib']
+
+
+def test_inspect_h5py_many():
+    from fact.io import to_h5py, inspect_h5py_many
+    import os
+
+    with tempfile.TemporaryDirectory() as d:
+        paths = [os.path.join(d, 'run_{}.hdf5'.format(i)) for i in range(3)]
+        for i, p in enumerate(paths):
+            to_h5py(pd.DataFrame({'x': np.arange(i)}), p, key='events')
+
+        schemas = inspect_h5py_many(d, key='events', n_jobs=2)
+        assert list(schemas) == paths
+        assert [s.n_rows for s in schemas.values()] == [0, 1, 2]
+
+        # cached results are returned as long as the file did not change
+        schemas_cached = inspect_h5py_many(paths, key='events')
+        assert schemas_cached[paths[1]] is schemas[paths[1]]
+
+        to_h5py(pd.DataFrame({'x': np.arange(5)}), paths[1], key='events')
+        schemas_changed = inspect_h5py_many(paths, key='events')
+        assert schemas_changed[paths[0]] is schemas[paths[0]]
+        assert schemas_changed[paths[1]].n_rows == 6
+
+
+@pytest.mark.parametrize('suffix', ['.parquet', '.arrow', '.feather'])
+def test_write_read_data_arrow(suffix):
+    pytest.importorskip('pyarrow')
+    from fact.io import write_data, read_data
+
+    df = pd.DataFrame({
+        'x': np.random.normal(size=250),
+        'N': np.random.randint(0, 10, size=250).astype('uint8'),
+        'name': ['Crab'] * 250,
+        's': [[i, 2 * i] for i in range(250)],
+        't': pd.date_range('2017-10-01', periods=250, freq='min'),
+    })
+    df.index = np.arange(250) * 2
+
+    with tempfile.NamedTemporaryFile(suffix=suffix) as f:
+        write_data(df, f.name, row_group_size=100)
+        df_read = read_data(f.name)
+
+        assert list(df_read.columns) == ['x', 'N', 'name', 's_0', 's_1', 't']
+        assert df_read['N'].dtype == np.uint8
+        assert df_read['t'].dtype == df['t'].dtype
+        assert (df_read.index == df.index).all()
+        assert (df_read['t'] == df['t']).all()
+        assert (df_read['s_1'] == 2 * np.arange(250)).all()
+        assert (df_read['name'] == 'Crab').all()
+
+        df_read = read_data(f.name, columns=['x', 's'], filters=[('N', '>', 4)])
+        selected = df[df['N'] > 4]
+        assert list(df_read.columns) == ['x', 's_0', 's_1']
+        assert (df_read.index == selected.index).all()
+        assert np.all(df_read['x'] == selected['x'])
+
+
+def test_parquet_row_groups():
+    pa = pytest.importorskip('pyarrow')
+    import pyarrow.parquet as pq
+    from fact.io import to_parquet, read_parquet
+
+    df = pd.DataFrame({
+        'x': np.arange(1000),
+        'c': pd.Categorical(['a', 'b'] * 500),
+    })
+
+    with tempfile.NamedTemporaryFile(suffix='.parquet') as f:
+        to_parquet(df, f.name, row_group_size=300)
+        assert pq.ParquetFile(f.name).num_row_groups == 4
+
+        df_read = read_parquet(f.name, filters=pa.compute.field('x') >= 900)
+        assert len(df_read) == 100
+        assert isinstance(df_read['c'].dtype, pd.CategoricalDtype)
+
+
+@pytest.mark.parametrize('suffix', ['.csv', '.json', '.jsonl', '.hdf5'])
+def test_read_data_chunked(suffix):
+    from fact.io import write_data, read_data_chunked
+
+    df = pd.DataFrame({
+        'x': np.random.normal(size=250),
+        'N': np.random.randint(0, 10, size=250),
+        'name': ['Crab'] * 250,
+    })
+
+    with tempfile.NamedTemporaryFile(suffix=suffix) as f:
+        write_data(df, f.name)
+
+        chunks = list(read_data_chunked(f.name, columns=['N', 'x'], chunksize=100))
+        assert [(start, end) for _, start, end in chunks] == [(0, 100), (100, 200), (200, 250)]
+
+        df_read = pd.concat([chunk for chunk, _, _ in chunks])
+        assert list(df_read.columns) == ['N', 'x']
+        assert (df_read.index == df.index).all()
+        assert (df_read['N'] == df['N']).all()
+        assert np.allclose(df_read['x'], df['x'])
+
+        chunks = list(read_data_chunked(f.name))
+        assert len(chunks) == 1
+        assert chunks[0][1:] == (0, 250)
+
+
+def test_read_data_chunked_pandas_hdf5():
+    from fact.io import read_data_chunked
+
+    df = pd.DataFrame({
+        'x': np.random.normal(size=250),
+        'N': np.random.randint(0, 10, size=250),
+    })
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        df.to_hdf(f.name, key='events', format='table')
+
+        chunks = list(read_data_chunked(f.name, key='events', columns=['N', 'x'], chunksize=100))
+        assert [(start, end) for _, start, end in chunks] == [(0, 100), (100, 200), (200, 250)]
+
+        df_read = pd.concat([chunk for chunk, _, _ in chunks])
+        assert list(df_read.columns) == ['N', 'x']
+        assert (df_read.index == df.index).all()
+        assert (df_read['N'] == df['N']).all()
+        assert np.allclose(df_read['x'], df['x'])
+
+        chunks = list(read_data_chunked(f.name, key='events'))
+        assert len(chunks) == 1
+        assert chunks[0][1:] == (0, 250)
+        assert chunks[0][0].equals(df)
+
+
+def test_sniff_hdf5_format():
+    from fact.io import to_h5py, sniff_hdf5_format, read_data
+
+    df = pd.DataFrame({'x': np.arange(10), 'y': np.linspace(0, 1, 10)})
+
+    with tempfile.NamedTemporaryFile(suffix='.hdf5') as f:
+        df.to_hdf(f.name, key='events', format='table')
+        assert sniff_hdf5_format(f.name) == 'pandas'
+        assert read_data(f.name, key='events').equals(df)
+
+        df.to_hdf(f.name, key='nested/events', format='fixed', mode='w')
+        assert sniff_hdf5_format(f.name) == 'pandas'
+
+        to_h5py(df, f.name, key='events', mode='w')
+        assert sniff_hdf5_format(f.name) == 'h5py'
+        assert np.all(read_data(f.name, key='events', columns=['y'])['y'] == df['y'])
+
+        # key defaults to "data" for h5py files
+        to_h5py(df, f.name, mode='w')
+        assert sniff_hdf5_format(f.name) == 'h5py'
+        assert np.all(read_data(f.name)['x'] == df['x'])